@@ -0,0 +1,142 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+import pandas as pd
+
+import gerar_dados
+import processamento
+
+# Tamanhos padrão: (linhas de Movement, linhas de Recebimento)
+TAMANHOS_PADRAO = [(10_000, 1_000), (100_000, 10_000), (1_000_000, 100_000)]
+
+def medir(funcao, repeticoes=1):
+    # Executa 'funcao' e devolve (resultado, menor tempo em segundos, pico de memória em MB)
+    # O tempo é medido sem tracemalloc, que deixaria o código Python bem mais lento; o pico vem de uma execução à parte
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    
+    tracemalloc.start()
+    funcao()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    
+    return resultado, min(tempos), pico / 1024 ** 2
+
+def remover_snapshots():
+    # Apaga os snapshots colunares para medir a carga a partir do CSV
+    for snapshot in glob.glob(os.path.join('Arquivos', '*.parquet')):
+        os.remove(snapshot)
+
+def linhas_resultado(resultado):
+    # Quantidade de linhas do relatório (armazenamento pode devolver um dicionário)
+    if isinstance(resultado, dict):
+        resultado = resultado.get('resultado', resultado.get('recebimento'))
+    return len(resultado) if resultado is not None else 0
+
+def executar_tamanho(diretorio, linhas_movimento, linhas_recebimento, repeticoes, cardinalidades):
+    # Gera os dados de um tamanho e mede carga, relatórios e armazenamento com e sem filtro
+    gerar_dados.gerar_dados(
+        os.path.join(diretorio, 'Arquivos'),
+        linhas_movimento=linhas_movimento,
+        linhas_recebimento=linhas_recebimento,
+        linhas_edicao=max(linhas_recebimento // 5, 1),
+        **cardinalidades
+    )
+    
+    diretorio_original = os.getcwd()
+    os.chdir(diretorio)
+    try:
+        medicoes = []
+        
+        def registrar(etapa, funcao, repeticoes_etapa=repeticoes):
+            resultado, segundos, pico_mb = medir(funcao, repeticoes_etapa)
+            medicoes.append({
+                'etapa': etapa,
+                'linhas_movimento': linhas_movimento,
+                'linhas_recebimento': linhas_recebimento,
+                'segundos': round(segundos, 6),
+                'pico_mb': round(pico_mb, 3),
+                'linhas_saida': linhas_resultado(resultado)
+            })
+            return resultado
+        
+        # Carga fria (sem snapshot) e carga com snapshot colunar já gravado
+        dados = registrar('carregar_dados (frio)', lambda: remover_snapshots() or processamento.carregar_dados(), 1)
+        registrar('carregar_dados (snapshot)', processamento.carregar_dados)
+        
+        recebimento_df = dados['recebimento']
+        movimento_df = dados['movimento']
+        rfid_col_recebimento = dados['rfid_col_recebimento']
+        rfid_col_movimento = dados['rfid_col_movimento']
+        
+        registrar('codigos_quantidades', lambda: processamento.codigos_quantidades(recebimento_df))
+        registrar('total_pallets_por_sku', lambda: processamento.total_pallets_por_sku(recebimento_df))
+        registrar('pallets_agrupados', lambda: processamento.pallets_agrupados(recebimento_df, rfid_col_recebimento))
+        registrar('armazenamento', lambda: processamento.armazenamento(
+            recebimento_df, movimento_df, rfid_col_recebimento, rfid_col_movimento,
+            indice_posicoes=dados['indice_posicoes']
+        ))
+        
+        # Filtro de uma hora a partir do primeiro recebimento
+        inicio = recebimento_df['timestamp'].min()
+        registrar('armazenamento (filtro 1h)', lambda: processamento.armazenamento(
+            recebimento_df, movimento_df, rfid_col_recebimento, rfid_col_movimento,
+            timestamp_inicio=inicio, timestamp_fim=inicio + pd.Timedelta(hours=1),
+            indice_posicoes=dados['indice_posicoes']
+        ))
+        
+        if dados['indice_posicoes'] is not None:
+            quantidades = processamento.quantidade_por_tag(recebimento_df, rfid_col_recebimento, dados['saldo_edicoes'])
+            registrar('construir_grade_ocupacao', lambda: processamento.construir_grade_ocupacao(dados['indice_posicoes'], quantidades)['tags'])
+        return medicoes
+    finally:
+        os.chdir(diretorio_original)
+
+def main():
+    # Linha de comando do benchmark; grava uma medição por linha (JSON lines)
+    parser = argparse.ArgumentParser(description="Benchmark de carga e relatórios sobre dados sintéticos.")
+    parser.add_argument('--tamanhos', nargs='*', default=None,
+                        help="Pares MOVIMENTO:RECEBIMENTO, ex.: 100000:10000 1000000:100000")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Repetições por etapa (vale o menor tempo)")
+    parser.add_argument('--tags', type=int, default=20_000)
+    parser.add_argument('--skus', type=int, default=500)
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--ruas', type=int, default=40)
+    parser.add_argument('--saida', default='benchmark_resultados.jsonl', help="Arquivo JSON lines de saída")
+    args = parser.parse_args()
+    
+    tamanhos = TAMANHOS_PADRAO
+    if args.tamanhos:
+        tamanhos = [tuple(int(valor) for valor in tamanho.split(':')) for tamanho in args.tamanhos]
+    
+    cardinalidades = {'tags': args.tags, 'skus': args.skus, 'usuarios': args.usuarios, 'ruas': args.ruas}
+    execucao = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        **cardinalidades
+    }
+    
+    warnings.filterwarnings('ignore')
+    with open(args.saida, 'a', encoding='utf-8') as saida:
+        for linhas_movimento, linhas_recebimento in tamanhos:
+            with tempfile.TemporaryDirectory() as diretorio:
+                medicoes = executar_tamanho(diretorio, linhas_movimento, linhas_recebimento, args.repeticoes, cardinalidades)
+            for medicao in medicoes:
+                saida.write(json.dumps({**execucao, **medicao}, ensure_ascii=False) + '\n')
+                print(f"{linhas_movimento:>10} {linhas_recebimento:>9}  {medicao['etapa']:<28} "
+                      f"{medicao['segundos']:>9.4f}s  {medicao['pico_mb']:>9.1f} MB  {medicao['linhas_saida']:>8} linhas")
+
+if __name__ == "__main__":
+    main()
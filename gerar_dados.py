@@ -0,0 +1,227 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# Layout das colunas de cada exportação, igual aos arquivos de exemplo em 'Arquivos/'
+COLUNAS_MOVIMENTO = ['tenant_id', 'username', 'tag_rfid', 'criado', 'x', 'y', 'z', 'type',
+                     'ground_position_alias', 'name', 'ground_position_group_level_name', 'moved_at']
+COLUNAS_RECEBIMENTO = ['tenant_id', 'rfid', 'admin_username', 'admin_first_name', 'admin_last_name', 'x', 'y', 'z',
+                       'coordenada_quantum', 'alias', 'type', 'sku', 'initial_quantity', 'product_name', 'task_ref',
+                       'event', 'timestamp']
+COLUNAS_EDICAO = ['tenant_id', 'crateid', 'rfid', 'user_username', 'user_first_name', 'user_last_name', 'device_name',
+                  'x', 'y', 'z', 'coordenada_quantum', 'alias', 'type', 'sku', 'edit_quantity', 'product_name', 'event',
+                  'task_type', 'timestamp']
+COLUNAS_ULTIMA_POSICAO = ['tenant_id', 'crate_id', 'tag_rfid', 'x', 'y', 'z', 'coordenada_quantum', 'alias', 'type',
+                          'name', 'sku', 'pack_size', 'quantity', 'timestamp', 'timestamp_created', 'state']
+
+NOMES_ARQUIVOS = {
+    'movimento': 'Teste Movement.csv',
+    'recebimento': 'Teste recebimento.csv',
+    'edicao': 'Teste edição.csv',
+    'ultima_posicao': 'Teste last position.csv'
+}
+
+TENANT = 'VIVENSIS'
+NIVEIS = np.array(['Nivel A', 'Nivel B', 'Nivel C', 'Nivel D', 'Nivel E', 'Nivel F'], dtype=object)
+TIPOS_MOVIMENTO = np.array(['STOCK', 'EXIT', 'EXPEDITION', 'DOCK', 'PROVISION'], dtype=object)
+PESOS_TIPOS_MOVIMENTO = [0.83, 0.14, 0.02, 0.007, 0.003]
+INICIO_TURNO = pd.Timestamp('2025-03-07 07:00:00')
+DURACAO_TURNO_MS = 10 * 60 * 60 * 1000
+
+def formatar_timestamps(instantes):
+    # Mesmo formato das exportações: '2025-03-07 09:18:19.827 -0300'
+    return pd.Series(instantes).dt.strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3] + ' -0300'
+
+def gerar_tags(quantidade, rng):
+    # Tags RFID no formato EPC de 24 dígitos hexadecimais
+    sufixos = rng.choice(16 ** 8, size=quantidade, replace=False) if quantidade < 16 ** 8 else np.arange(quantidade)
+    return np.array([f"E2801191A504006D{sufixo:08X}" for sufixo in sufixos], dtype=object)
+
+def gerar_ruas(quantidade):
+    # Ruas com lado par/ímpar e o prefixo de alias correspondente
+    numeros = np.arange(quantidade) // 2 + 1
+    lados = np.where(np.arange(quantidade) % 2 == 0, 'PAR', 'ÍMPAR')
+    nomes = np.array([f"Rua {numero:02d} Lado {lado}" for numero, lado in zip(numeros, lados)], dtype=object)
+    return nomes, numeros
+
+def gerar_usuarios(quantidade):
+    # Usuários (username, primeiro nome, sobrenome)
+    return (
+        np.array([f"operador{i}" for i in range(quantidade)], dtype=object),
+        np.array([f"Operador{i}" for i in range(quantidade)], dtype=object),
+        np.array([f"Silva{i}" for i in range(quantidade)], dtype=object)
+    )
+
+def gerar_skus(quantidade):
+    # Códigos de item e nomes de produto
+    return (
+        np.array([f"SK{i:05d}" for i in range(quantidade)], dtype=object),
+        np.array([f"PRODUTO SINTETICO {i}" for i in range(quantidade)], dtype=object)
+    )
+
+def gravar_csv(df, caminho):
+    # Cabeçalho entre aspas e separador ';', como nas exportações do WMS
+    with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+        arquivo.write(';'.join(f'"{col}"' for col in df.columns) + '\n')
+        df.to_csv(arquivo, sep=';', header=False, index=False)
+
+def gerar_recebimento(linhas, tags, usuarios, skus, rng):
+    # Eventos de recebimento: ~90% FINISH_RECEIVING com pallet, o restante START_RECEIVING sem pallet
+    finalizado = rng.random(linhas) < 0.9
+    usuario = rng.integers(0, len(usuarios[0]), linhas)
+    sku = rng.integers(0, len(skus[0]), linhas)
+    x = rng.integers(1, 80, linhas)
+    y = rng.integers(1, 80, linhas)
+    instantes = INICIO_TURNO + pd.to_timedelta(np.sort(rng.integers(0, DURACAO_TURNO_MS, linhas)), unit='ms')
+    
+    return pd.DataFrame({
+        'tenant_id': TENANT,
+        'rfid': np.where(finalizado, tags[rng.integers(0, len(tags), linhas)], None),
+        'admin_username': usuarios[0][usuario],
+        'admin_first_name': usuarios[1][usuario],
+        'admin_last_name': usuarios[2][usuario],
+        'x': np.where(finalizado, None, x),
+        'y': np.where(finalizado, None, y),
+        'z': None,
+        'coordenada_quantum': np.where(finalizado, '-', pd.Series(x).astype(str) + '-' + pd.Series(y).astype(str)),
+        'alias': np.where(finalizado, None, '#AR9'),
+        'type': np.where(finalizado, None, 'DOCK'),
+        'sku': np.where(finalizado, skus[0][sku], None),
+        'initial_quantity': np.where(finalizado, rng.integers(1, 500, linhas), None),
+        'product_name': np.where(finalizado, skus[1][sku], None),
+        'task_ref': None,
+        'event': np.where(finalizado, 'FINISH_RECEIVING', 'START_RECEIVING'),
+        'timestamp': formatar_timestamps(instantes)
+    }, columns=COLUNAS_RECEBIMENTO)
+
+def gerar_movimento(linhas, tags, usuarios, ruas, rng):
+    # Movimentações das tags pelas ruas/níveis ao longo do turno (cerca de 5% sem tag)
+    nomes_ruas, numeros_ruas = ruas
+    rua = rng.integers(0, len(nomes_ruas), linhas)
+    posicao = rng.integers(1, 60, linhas)
+    tipo = rng.choice(TIPOS_MOVIMENTO, size=linhas, p=PESOS_TIPOS_MOVIMENTO)
+    instantes = INICIO_TURNO + pd.to_timedelta(np.sort(rng.integers(0, DURACAO_TURNO_MS, linhas)), unit='ms')
+    movido = formatar_timestamps(instantes)
+    criado = formatar_timestamps(instantes + pd.to_timedelta(rng.integers(50, 500, linhas), unit='ms'))
+    
+    alias = pd.Series(numeros_ruas[rua]).map('{:02d}'.format) + '-' + pd.Series(posicao).map('{:02d}'.format)
+    
+    return pd.DataFrame({
+        'tenant_id': TENANT,
+        'username': usuarios[0][rng.integers(0, len(usuarios[0]), linhas)],
+        'tag_rfid': np.where(rng.random(linhas) < 0.95, tags[rng.integers(0, len(tags), linhas)], None),
+        'criado': criado,
+        'x': rng.integers(1, 80, linhas),
+        'y': rng.integers(1, 80, linhas),
+        'z': rng.integers(0, 250, linhas),
+        'type': tipo,
+        'ground_position_alias': np.where(tipo == 'STOCK', alias, 'LIXO1'),
+        'name': np.where(tipo == 'STOCK', nomes_ruas[rua], None),
+        'ground_position_group_level_name': np.where(tipo == 'STOCK', NIVEIS[rng.integers(0, len(NIVEIS), linhas)], None),
+        'moved_at': movido
+    }, columns=COLUNAS_MOVIMENTO)
+
+def gerar_edicao(linhas, tags, usuarios, skus, rng):
+    # Ajustes de quantidade (CRATE_PRODUCT_UPDATE) com 'edit_quantity' positivo ou negativo
+    usuario = rng.integers(0, len(usuarios[0]), linhas)
+    sku = rng.integers(0, len(skus[0]), linhas)
+    tag = rng.integers(0, len(tags), linhas)
+    instantes = INICIO_TURNO + pd.to_timedelta(np.sort(rng.integers(0, DURACAO_TURNO_MS, linhas)), unit='ms')
+    
+    return pd.DataFrame({
+        'tenant_id': TENANT,
+        'crateid': pd.Series(tag).map('crate-{:08d}'.format),
+        'rfid': tags[tag],
+        'user_username': usuarios[0][usuario],
+        'user_first_name': usuarios[1][usuario],
+        'user_last_name': usuarios[2][usuario],
+        'device_name': None,
+        'x': None,
+        'y': None,
+        'z': None,
+        'coordenada_quantum': '-',
+        'alias': None,
+        'type': None,
+        'sku': skus[0][sku],
+        'edit_quantity': rng.choice([-10, -5, -2, -1, 1, 2, 5, 10], size=linhas),
+        'product_name': skus[1][sku],
+        'event': 'CRATE_PRODUCT_UPDATE',
+        'task_type': None,
+        'timestamp': formatar_timestamps(instantes)
+    }, columns=COLUNAS_EDICAO)
+
+def gerar_ultima_posicao(movimento_df, skus, rng):
+    # Última posição de cada tag a partir do movimento mais recente
+    ultimos = movimento_df.dropna(subset=['tag_rfid']).drop_duplicates('tag_rfid', keep='last')
+    linhas = len(ultimos)
+    sku = rng.integers(0, len(skus[0]), linhas)
+    
+    return pd.DataFrame({
+        'tenant_id': TENANT,
+        'crate_id': pd.Series(np.arange(linhas)).map('crate-{:08d}'.format).values,
+        'tag_rfid': ultimos['tag_rfid'].values,
+        'x': ultimos['x'].values,
+        'y': ultimos['y'].values,
+        'z': ultimos['z'].values,
+        'coordenada_quantum': (ultimos['x'].astype(str) + '-' + ultimos['y'].astype(str)).values,
+        'alias': ultimos['ground_position_alias'].values,
+        'type': ultimos['type'].values,
+        'name': skus[1][sku],
+        'sku': skus[0][sku],
+        'pack_size': 1,
+        'quantity': rng.integers(1, 500, linhas),
+        'timestamp': ultimos['moved_at'].values,
+        'timestamp_created': ultimos['criado'].values,
+        'state': np.where(ultimos['type'].values == 'STOCK', 'STORED', 'RECEIVED')
+    }, columns=COLUNAS_ULTIMA_POSICAO)
+
+def gerar_dados(destino, linhas_movimento=100_000, linhas_recebimento=10_000, linhas_edicao=2_000,
+                tags=20_000, skus=500, usuarios=20, ruas=40, semente=42):
+    # Gera os quatro CSVs sintéticos em 'destino' e devolve os caminhos gerados
+    rng = np.random.default_rng(semente)
+    os.makedirs(destino, exist_ok=True)
+    
+    lista_tags = gerar_tags(tags, rng)
+    lista_usuarios = gerar_usuarios(usuarios)
+    lista_skus = gerar_skus(skus)
+    lista_ruas = gerar_ruas(ruas)
+    
+    movimento_df = gerar_movimento(linhas_movimento, lista_tags, lista_usuarios, lista_ruas, rng)
+    tabelas = {
+        'movimento': movimento_df,
+        'recebimento': gerar_recebimento(linhas_recebimento, lista_tags, lista_usuarios, lista_skus, rng),
+        'edicao': gerar_edicao(linhas_edicao, lista_tags, lista_usuarios, lista_skus, rng),
+        'ultima_posicao': gerar_ultima_posicao(movimento_df, lista_skus, rng)
+    }
+    
+    caminhos = {}
+    for tipo, df in tabelas.items():
+        caminhos[tipo] = os.path.join(destino, NOMES_ARQUIVOS[tipo])
+        gravar_csv(df, caminhos[tipo])
+    
+    return caminhos
+
+def main():
+    # Linha de comando do gerador de dados sintéticos
+    parser = argparse.ArgumentParser(description="Gera CSVs sintéticos de Movement/Recebimento/edição/last position.")
+    parser.add_argument('--destino', default='dados_sinteticos/Arquivos', help="Diretório de saída")
+    parser.add_argument('--movimento', type=int, default=100_000, help="Linhas de Movement")
+    parser.add_argument('--recebimento', type=int, default=10_000, help="Linhas de Recebimento")
+    parser.add_argument('--edicao', type=int, default=2_000, help="Linhas de edição")
+    parser.add_argument('--tags', type=int, default=20_000, help="Quantidade de tags RFID distintas")
+    parser.add_argument('--skus', type=int, default=500, help="Quantidade de SKUs distintos")
+    parser.add_argument('--usuarios', type=int, default=20, help="Quantidade de usuários distintos")
+    parser.add_argument('--ruas', type=int, default=40, help="Quantidade de ruas (lados) distintas")
+    parser.add_argument('--semente', type=int, default=42, help="Semente do gerador aleatório")
+    args = parser.parse_args()
+    
+    caminhos = gerar_dados(
+        args.destino, args.movimento, args.recebimento, args.edicao,
+        args.tags, args.skus, args.usuarios, args.ruas, args.semente
+    )
+    for tipo, caminho in caminhos.items():
+        print(f"{tipo}: {caminho}")
+
+if __name__ == "__main__":
+    main()
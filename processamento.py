@@ -0,0 +1,1794 @@
+import pandas as pd
+import numpy as np
+import codecs
+import functools
+import glob
+import io
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+import unicodedata
+import warnings
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pacsv = pq = None
+
+DIRETORIO_DADOS = 'Arquivos'
+ARQUIVO_MOVIMENTO = 'Teste Movement.csv'
+ARQUIVO_RECEBIMENTO = 'Teste recebimento.csv'
+ARQUIVO_ULTIMA_POSICAO = 'Teste last position.csv'
+ARQUIVO_EDICAO = 'Teste edição.csv'
+CAMINHO_MOVIMENTO = os.path.join(DIRETORIO_DADOS, ARQUIVO_MOVIMENTO)
+DIRETORIO_RELATORIOS = 'Relatorios'
+TAMANHO_BLOCO = 100_000
+TAMANHO_AMOSTRA_CODIFICACAO = 1 << 20
+TAMANHO_CAUDA_INGESTAO = 4096
+# Formato dos snapshots Parquet: incrementar sempre que ler_csv, normalizar_csv ou aplicar_esquema mudarem
+# o DataFrame produzido (mudanças nos ESQUEMA_* já entram na versão gravada em cada snapshot)
+VERSAO_SNAPSHOT = 3
+COLUNAS_TEXTO = ['sku', 'admin_username', 'username', 'name', 'ground_position_alias', 'alias']
+
+# Esquema de tipos por arquivo exportado: colunas repetitivas como categóricas,
+# coordenadas como inteiros pequenos e timestamps com fuso horário
+ESQUEMA_MOVIMENTO = {
+    'categoricas': ['tenant_id', 'username', 'type', 'ground_position_alias', 'name', 'ground_position_group_level_name'],
+    'coordenadas': ['x', 'y', 'z'],
+    'timestamps': ['criado', 'moved_at']
+}
+ESQUEMA_RECEBIMENTO = {
+    'categoricas': ['tenant_id', 'admin_username', 'admin_first_name', 'admin_last_name', 'coordenada_quantum',
+                    'alias', 'type', 'sku', 'product_name', 'event'],
+    'coordenadas': ['x', 'y', 'z'],
+    'timestamps': ['timestamp']
+}
+ESQUEMA_EDICAO = {
+    'categoricas': ['tenant_id', 'user_username', 'user_first_name', 'user_last_name', 'device_name', 'coordenada_quantum',
+                    'alias', 'type', 'sku', 'product_name', 'event', 'task_type'],
+    'coordenadas': ['x', 'y', 'z'],
+    'timestamps': ['timestamp']
+}
+ESQUEMA_ULTIMA_POSICAO = {
+    'categoricas': ['tenant_id', 'coordenada_quantum', 'alias', 'type', 'name', 'sku', 'state'],
+    'coordenadas': ['x', 'y', 'z'],
+    'timestamps': ['timestamp', 'timestamp_created']
+}
+ESQUEMA_PADRAO = {'categoricas': [], 'coordenadas': [], 'timestamps': ['timestamp']}
+
+# Trechos do nome que identificam o tipo de cada exportação (uma por dia e por tipo em 'Arquivos/')
+TRECHOS_NOME_ARQUIVO = {
+    'movimento': ('movement', 'movimento'),
+    'recebimento': ('recebimento',),
+    'edicao': ('edição', 'edicao'),
+    'ultima_posicao': ('last position', 'ultima posicao', 'última posição')
+}
+ESQUEMAS = {
+    'movimento': ESQUEMA_MOVIMENTO,
+    'recebimento': ESQUEMA_RECEBIMENTO,
+    'edicao': ESQUEMA_EDICAO,
+    'ultima_posicao': ESQUEMA_ULTIMA_POSICAO
+}
+
+INTERVALOS_PALLETS = [1, 5, 15, 60]
+TAMANHO_CELULA_Z = 100
+# Acima deste número de células (caixa que envolve as posições) a grade de ocupação passa a esparsa:
+# coordenadas discrepantes (ex.: x=y=30000) não alocam a caixa inteira
+LIMITE_CELULAS_GRADE = 5_000_000
+TIPOS_OCUPACAO = ('STOCK',)
+RUA_NAO_RASTREADA = ''
+ROTULOS_MINUTO = np.array([f"{minuto // 60:02d}:{minuto % 60:02d}" for minuto in range(24 * 60)], dtype=object)
+
+# Estado da ingestão incremental por tipo de exportação: estado de cada arquivo (inode, cabeçalho, offset lido,
+# cauda), DataFrame acumulado e estruturas atualizadas a partir das linhas novas
+_ESTADO_INGESTAO = {}
+_TRAVA_INGESTAO = threading.RLock()
+_GERACOES_INGESTAO = itertools.count(1)
+
+# Medições por etapa da execução atual (uma lista por thread: cada sessão do Streamlit roda na sua)
+ARQUIVO_LOG_DESEMPENHO = 'desempenho.jsonl'
+_MEDICOES = threading.local()
+
+def iniciar_medicoes():
+    # Começa uma lista nova de medições; sem esta chamada (batch, benchmark) as etapas não são registradas
+    _MEDICOES.registros = []
+    _MEDICOES.picos = []
+    return _MEDICOES.registros
+
+@contextmanager
+def medir_etapa(etapa, linhas_entrada=None):
+    # Registra tempo, linhas de entrada/saída e pico de memória de uma etapa; quem chama preenche 'linhas_saida'
+    # O pico só é medido com o tracemalloc ativo; etapas aninhadas repassam o seu pico para a etapa externa
+    registros = getattr(_MEDICOES, 'registros', None)
+    picos = getattr(_MEDICOES, 'picos', [])
+    registro = {
+        'etapa': etapa,
+        'nivel': len(picos),
+        'segundos': None,
+        'linhas_entrada': linhas_entrada,
+        'linhas_saida': None,
+        'pico_mb': None
+    }
+    if registros is not None:
+        registros.append(registro)
+    
+    rastreando = tracemalloc.is_tracing()
+    if rastreando:
+        memoria_inicio, pico = tracemalloc.get_traced_memory()
+        if picos:
+            picos[-1] = max(picos[-1], pico)
+        tracemalloc.reset_peak()
+    picos.append(0)
+    
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['segundos'] = round(time.perf_counter() - inicio, 6)
+        pico = picos.pop()
+        if rastreando and tracemalloc.is_tracing():
+            pico = max(pico, tracemalloc.get_traced_memory()[1])
+            registro['pico_mb'] = round((pico - memoria_inicio) / 1024 ** 2, 3)
+            if picos:
+                picos[-1] = max(picos[-1], pico)
+
+def linhas_resultado(resultado):
+    # Linhas de um resultado de relatório (armazenamento pode devolver um dicionário com 'resultado')
+    if isinstance(resultado, dict):
+        resultado = resultado.get('resultado')
+    return len(resultado) if isinstance(resultado, (pd.DataFrame, pd.Series)) else None
+
+def medido(etapa):
+    # Decorador que mede a função como uma etapa: linhas do primeiro argumento -> linhas do resultado
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with medir_etapa(etapa, len(args[0]) if args and isinstance(args[0], pd.DataFrame) else None) as medicao:
+                resultado = funcao(*args, **kwargs)
+                medicao['linhas_saida'] = linhas_resultado(resultado)
+            return resultado
+        return medida
+    return decorador
+
+def gravar_medicoes(registros, caminho=ARQUIVO_LOG_DESEMPENHO, contexto=None):
+    # Acrescenta as medições ao log JSON lines (uma etapa por linha, com o contexto da execução)
+    contexto = {'data': pd.Timestamp.now().isoformat(timespec='seconds'), **(contexto or {})}
+    with open(caminho, 'a', encoding='utf-8') as log:
+        for registro in registros:
+            log.write(json.dumps({**contexto, **registro}, ensure_ascii=False, default=str) + '\n')
+
+def impressao_digital_arquivos(caminhos):
+    # Assinatura (caminho, tamanho, mtime) de cada arquivo de entrada, usada como chave do cache
+    assinatura = []
+    for caminho in caminhos:
+        try:
+            info = os.stat(caminho)
+            assinatura.append((caminho, info.st_size, info.st_mtime_ns))
+        except OSError:
+            assinatura.append((caminho, None, None))
+    return tuple(assinatura)
+
+def versao_dados(diretorio=DIRETORIO_DADOS, data_inicio=None, data_fim=None):
+    # Versão dos dados de entrada: assinatura dos CSVs de movimento, recebimento e edição de 'diretorio'
+    # no período (o mesmo conjunto de arquivos que carregar_dados lê com as mesmas datas)
+    exportacoes = descobrir_exportacoes(diretorio, data_inicio, data_fim)
+    return impressao_digital_arquivos(
+        (exportacoes['movimento'] or [os.path.join(diretorio, ARQUIVO_MOVIMENTO)]) +
+        (exportacoes['recebimento'] or [os.path.join(diretorio, ARQUIVO_RECEBIMENTO)]) +
+        exportacoes['edicao']
+    )
+
+def tipo_do_arquivo(caminho):
+    # Tipo da exportação ('movimento', 'recebimento', 'edicao', 'ultima_posicao') pelo nome do arquivo
+    nome = unicodedata.normalize('NFC', os.path.basename(caminho)).lower()
+    for tipo, trechos in TRECHOS_NOME_ARQUIVO.items():
+        if any(trecho in nome for trecho in trechos):
+            return tipo
+    return None
+
+def data_do_arquivo(caminho):
+    # Data da exportação no nome do arquivo (AAAA-MM-DD, AAAA_MM_DD ou AAAAMMDD), se houver
+    encontrada = re.search(r'(\d{4})[-_]?(\d{2})[-_]?(\d{2})', os.path.basename(caminho))
+    if not encontrada:
+        return None
+    try:
+        return date(*(int(parte) for parte in encontrada.groups()))
+    except ValueError:
+        return None
+
+def descobrir_exportacoes(diretorio=DIRETORIO_DADOS, data_inicio=None, data_fim=None):
+    # CSVs de 'diretorio' agrupados por tipo e ordenados por data; arquivos sem data no nome sempre entram
+    data_inicio = pd.Timestamp(data_inicio).date() if data_inicio is not None else None
+    data_fim = pd.Timestamp(data_fim).date() if data_fim is not None else None
+    
+    exportacoes = {tipo: [] for tipo in TRECHOS_NOME_ARQUIVO}
+    for caminho in glob.glob(os.path.join(diretorio, '*.csv')):
+        tipo = tipo_do_arquivo(caminho)
+        if tipo is None:
+            continue
+        
+        data = data_do_arquivo(caminho)
+        if data is not None and ((data_inicio and data < data_inicio) or (data_fim and data > data_fim)):
+            continue
+        
+        exportacoes[tipo].append(caminho)
+    
+    for caminhos in exportacoes.values():
+        caminhos.sort(key=lambda caminho: (data_do_arquivo(caminho) or date.min, caminho))
+    
+    return exportacoes
+
+def ler_exportacoes(caminhos, processos=None):
+    # Lê vários CSVs do mesmo tipo em paralelo (um processo por arquivo) e os concatena num único DataFrame tipado
+    partes = ler_em_paralelo(ler_csv_com_snapshot, caminhos, processos)
+    return partes[0] if len(partes) == 1 else concatenar_partes(partes, esquema_do_arquivo(caminhos[0]))
+
+def ler_em_paralelo(leitura, caminhos, processos=None):
+    # Aplica 'leitura' a cada arquivo, um processo por arquivo; um arquivo só é lido no próprio processo
+    # 'leitura' devolve um DataFrame ou uma tupla que começa por ele (linhas contadas na medição)
+    if len(caminhos) == 1:
+        return [leitura(caminhos[0])]
+    
+    # As etapas dentro dos processos filhos não são registradas; a leitura paralela é medida como um todo
+    with medir_etapa(f"leitura paralela: {len(caminhos)} arquivos") as medicao:
+        with ProcessPoolExecutor(max_workers=processos or min(len(caminhos), os.cpu_count() or 1)) as executor:
+            resultados = list(executor.map(leitura, caminhos))
+        medicao['linhas_saida'] = sum(len(r[0] if isinstance(r, tuple) else r) for r in resultados)
+    
+    return resultados
+
+def concatenar_partes(partes, esquema):
+    # Concatena partes lidas do mesmo tipo de exportação somando as medições de memória e linhas descartadas
+    # As categorias são unificadas antes do concat (senão a coluna vira object e o esquema recodifica o total)
+    partes = unificar_categorias(partes, esquema['categoricas'])
+    df = aplicar_esquema(pd.concat(partes, ignore_index=True), esquema)
+    df.attrs['memoria'] = {
+        'antes': sum(parte.attrs.get('memoria', {}).get('antes', 0) for parte in partes),
+        'depois': memoria_dataframe(df)
+    }
+    df.attrs['linhas_descartadas'] = sum(parte.attrs.get('linhas_descartadas', 0) for parte in partes)
+    
+    return df
+
+def unificar_categorias(partes, colunas):
+    # Dá às colunas categóricas de todas as partes a união ordenada das categorias (a mesma ordem de astype('category')
+    # sobre o total); partes cujas categorias já são a união não são recodificadas
+    # Partes sem nenhum valor na coluna não entram na união: o tipo das categorias vazias não é o do texto
+    for col in colunas:
+        if not all(col in parte.columns and isinstance(parte[col].dtype, pd.CategoricalDtype) for parte in partes):
+            continue
+        
+        categorias = None
+        for parte in partes:
+            if len(parte[col].cat.categories):
+                categorias = parte[col].cat.categories if categorias is None else categorias.union(parte[col].cat.categories)
+        if categorias is None:
+            continue
+        
+        partes = [
+            parte if parte[col].cat.categories.equals(categorias)
+            else parte.assign(**{col: parte[col].cat.set_categories(categorias)})
+            for parte in partes
+        ]
+    
+    return partes
+
+def ler_csv(caminho, conteudo=None):
+    # Leitura de um CSV exportado (separador ';') com normalização de colunas, RFID e timestamps
+    # 'conteudo' permite processar bytes já lidos do arquivo (cabeçalho + linhas novas)
+    # Usa o parser multithread do pyarrow quando disponível; o pandas fica como alternativa
+    esquema = esquema_do_arquivo(caminho)
+    
+    with medir_etapa(f"leitura: {os.path.basename(caminho)}") as leitura:
+        codificacao = detectar_codificacao(caminho, TAMANHO_AMOSTRA_CODIFICACAO, conteudo)
+        
+        lido = ler_csv_pyarrow(caminho, conteudo, codificacao, esquema) if pacsv is not None else None
+        if lido is None:
+            lido = ler_csv_pandas(caminho, conteudo, codificacao)
+        df, linhas_descartadas = lido
+        leitura['linhas_saida'] = len(df)
+    
+    df = normalizar_csv(df, esquema)
+    df.attrs['linhas_descartadas'] = linhas_descartadas
+    
+    return df
+
+def ler_csv_pyarrow(caminho, conteudo, codificacao, esquema):
+    # Retorna (DataFrame, linhas descartadas) ou None se o pyarrow não conseguir ler o arquivo
+    # Linhas com campos a mais são puladas e contadas, como no pandas; linhas com campos a menos o pandas completa
+    # com NaN, o que o pyarrow não faz: a leitura é abortada e o arquivo vai para o pandas
+    descartadas = 0
+    
+    def descartar(linha):
+        nonlocal descartadas
+        if linha.actual_columns < linha.expected_columns:
+            return 'error'
+        descartadas += 1
+        return 'skip'
+    
+    # Colunas de texto e categóricas ficam como string (ex.: SKUs numéricos, aliases como '02-08')
+    colunas_texto = set(COLUNAS_TEXTO) | set(esquema['categoricas'])
+    
+    for tentativa in (codificacao, 'latin1'):
+        descartadas = 0
+        try:
+            tabela = pacsv.read_csv(
+                io.BytesIO(conteudo) if conteudo is not None else caminho,
+                read_options=pacsv.ReadOptions(encoding=tentativa, use_threads=True),
+                parse_options=pacsv.ParseOptions(delimiter=';', invalid_row_handler=descartar),
+                convert_options=pacsv.ConvertOptions(
+                    column_types={col: pa.string() for col in colunas_texto},
+                    strings_can_be_null=True
+                )
+            )
+        except (pa.ArrowInvalid, UnicodeDecodeError) as erro:
+            # UTF-8 inválido depois da amostra: tenta de novo como latin1; outros erros vão para o pandas
+            if tentativa != 'latin1' and 'utf8' in str(erro).lower().replace('-', ''):
+                continue
+            return None
+        
+        # Colunas sem nenhum valor chegam como tipo nulo; o pandas as leria como float (NaN)
+        df = tabela.to_pandas()
+        for col in df.columns:
+            if pa.types.is_null(tabela.schema.field(col).type):
+                df[col] = df[col].astype(float)
+        return df, descartadas
+    
+    return None
+
+def ler_csv_pandas(caminho, conteudo, codificacao):
+    # Retorna (DataFrame, linhas descartadas) com o parser do pandas; as linhas puladas são contadas pelos avisos
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        try:
+            df = pd.read_csv(io.BytesIO(conteudo) if conteudo is not None else caminho,
+                             sep=';', encoding=codificacao, on_bad_lines='warn')
+        except UnicodeDecodeError:
+            avisos.clear()
+            df = pd.read_csv(io.BytesIO(conteudo) if conteudo is not None else caminho,
+                             sep=';', encoding='latin1', on_bad_lines='warn')
+    
+    return df, contar_linhas_puladas(avisos)
+
+def contar_linhas_puladas(avisos):
+    # Linhas com campos a mais puladas pelo pandas (on_bad_lines='warn'), contadas pelos avisos registrados
+    return sum(str(aviso.message).count('Skipping line') for aviso in avisos
+               if issubclass(aviso.category, pd.errors.ParserWarning))
+
+def esquema_do_arquivo(caminho):
+    # Escolhe o esquema de tipos pelo nome do arquivo exportado
+    return ESQUEMAS.get(tipo_do_arquivo(caminho), ESQUEMA_PADRAO)
+
+def memoria_dataframe(df):
+    # Memória ocupada pelo DataFrame em bytes (inclui o conteúdo das strings)
+    return int(df.memory_usage(deep=True).sum())
+
+def normalizar_csv(df, esquema=ESQUEMA_PADRAO):
+    # Limpa nomes de colunas e converte RFID e tipos do esquema
+    with medir_etapa("normalização de colunas", len(df)) as medicao:
+        df.columns = df.columns.str.strip('" ')
+        
+        for col in df.columns:
+            if 'rfid' in col.lower():
+                df[col] = df[col].astype(str)
+        
+        memoria_antes = memoria_dataframe(df)
+        df = aplicar_esquema(df, esquema)
+        df.attrs['memoria'] = {'antes': memoria_antes, 'depois': memoria_dataframe(df)}
+        medicao['linhas_saida'] = len(df)
+    
+    return df
+
+def aplicar_esquema(df, esquema):
+    # Converte as colunas do esquema; colunas que já estão no tipo certo são mantidas
+    for col in esquema['timestamps']:
+        if col in df.columns and not isinstance(df[col].dtype, pd.DatetimeTZDtype):
+            with medir_etapa(f"timestamps: {col}", len(df)) as medicao:
+                df[col] = converter_timestamps(df[col])
+                medicao['linhas_saida'] = int(df[col].notna().sum())
+    
+    for col in esquema['coordenadas']:
+        # Inteiro já reduzido (ex.: concat de partes convertidas) é mantido: a largura é a maior das partes
+        if col in df.columns and not (pd.api.types.is_integer_dtype(df[col]) and df[col].dtype.itemsize < 8):
+            inteiros = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(np.int64)
+            df[col] = pd.to_numeric(inteiros, downcast='integer')
+    
+    for col in esquema['categoricas']:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    
+    return df
+
+def converter_timestamps(serie):
+    # Timestamps 'AAAA-MM-DD HH:MM:SS.fff -0300': com um único fuso no arquivo, a parte local é lida
+    # em formato fixo e o deslocamento é aplicado uma vez (a inferência linha a linha do fuso é lenta)
+    if not (pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie)):
+        return pd.to_datetime(serie, errors='coerce')
+    
+    texto = serie.astype(str).str.strip()
+    validos = texto[serie.notna()]
+    deslocamentos = validos.str[-6:].value_counts()
+    
+    fusos = [fuso_do_deslocamento(deslocamento) for deslocamento in deslocamentos.index]
+    if len(fusos) == 1 and fusos[0] is not None:
+        locais = pd.to_datetime(texto.str[:-6].where(serie.notna()), format='ISO8601', errors='coerce')
+        if locais.notna().sum() == len(validos):
+            return locais.dt.tz_localize(fusos[0])
+    
+    # Fusos misturados (ex.: -0300 e -0200 na troca de horário de verão, ou partes de arquivos diferentes):
+    # lidos em UTC e convertidos para o fuso mais frequente, para que a coluna tenha um único fuso
+    if len(fusos) <= 1 or None in fusos:
+        try:
+            return pd.to_datetime(serie, errors='coerce')
+        except ValueError:
+            pass
+    
+    instantes = pd.to_datetime(serie, utc=True, errors='coerce')
+    return instantes.dt.tz_convert(fusos[0]) if fusos and fusos[0] is not None else instantes
+
+def fuso_do_deslocamento(deslocamento):
+    # Fuso fixo de um deslocamento '-0300' ou '-03:00' (com ou sem espaço antes) ou None se não for um deslocamento
+    deslocamento = deslocamento.strip()
+    if not re.fullmatch(r'[+-]\d{2}:?\d{2}', deslocamento):
+        return None
+    minutos = int(deslocamento[1:3]) * 60 + int(deslocamento[-2:])
+    return timezone(timedelta(minutes=-minutos if deslocamento[0] == '-' else minutos))
+
+def caminho_snapshot(caminho):
+    # Snapshot colunar fica ao lado do CSV de origem
+    return os.path.splitext(caminho)[0] + '.parquet'
+
+def versao_snapshot(caminho):
+    # Versão do formato e esquema de tipos com que o snapshot do arquivo foi gerado
+    return json.dumps({'formato': VERSAO_SNAPSHOT, 'esquema': esquema_do_arquivo(caminho)}, sort_keys=True).encode()
+
+def ler_snapshot(caminho, origem=None):
+    # Snapshot Parquet do CSV, somente se foi gerado a partir da versão atual do arquivo e pelo formato atual
+    # 'origem' é a assinatura (caminho, tamanho, mtime) exigida; por padrão, a do arquivo agora
+    destino = caminho_snapshot(caminho)
+    origem = origem or impressao_digital_arquivos([caminho])[0]
+    if pq is None or not os.path.exists(destino):
+        return None
+    
+    try:
+        with medir_etapa(f"snapshot: {os.path.basename(destino)}") as medicao:
+            tabela = pq.read_table(destino, memory_map=True)
+            metadados = tabela.schema.metadata or {}
+            if (metadados.get(b'origem') != repr(origem).encode()
+                    or metadados.get(b'versao') != versao_snapshot(caminho)):
+                return None
+            df = tabela.to_pandas()
+            medicao['linhas_saida'] = len(df)
+        return df
+    except Exception:
+        return None
+
+def gravar_snapshot(caminho, df, origem):
+    # Grava o snapshot Parquet do CSV já processado (falhas não impedem o carregamento)
+    # 'origem' é a assinatura do arquivo tomada antes da leitura: se ele cresceu durante a leitura,
+    # o snapshot fica com a assinatura antiga e não é usado
+    if pa is None:
+        return
+    
+    try:
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        metadados = dict(tabela.schema.metadata or {})
+        metadados[b'origem'] = repr(origem).encode()
+        metadados[b'versao'] = versao_snapshot(caminho)
+        pq.write_table(tabela.replace_schema_metadata(metadados), caminho_snapshot(caminho))
+    except Exception:
+        pass
+
+def ler_csv_com_snapshot(caminho):
+    # Usa o snapshot colunar quando o CSV não mudou; caso contrário processa o CSV e regrava o snapshot
+    origem = impressao_digital_arquivos([caminho])[0]
+    df = ler_snapshot(caminho, origem)
+    if df is None:
+        df = ler_csv(caminho)
+        gravar_snapshot(caminho, df, origem)
+    return df
+
+def assinatura_cauda(conteudo):
+    # Soma de verificação dos últimos bytes já lidos: detecta arquivo truncado e reescrito além do offset
+    return zlib.crc32(conteudo[-TAMANHO_CAUDA_INGESTAO:])
+
+def ler_csv_inteiro(caminho):
+    # Leitura completa para a ingestão incremental: retorna (DataFrame, estado do arquivo) sem tocar em _ESTADO_INGESTAO,
+    # o que permite rodar em outro processo; o estado (inode, cabeçalho, offset e cauda) cobre só os bytes lidos
+    info = os.stat(caminho)
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read(info.st_size)
+    
+    # Linha incompleta no fim (escrita em andamento) fica para a próxima leitura; o snapshot só vale se
+    # cobre exatamente esse conteúdo (mesma assinatura do stat)
+    cabecalho = conteudo[:conteudo.find(b'\n') + 1]
+    conteudo = conteudo[:conteudo.rfind(b'\n') + 1]
+    origem = (caminho, info.st_size, info.st_mtime_ns)
+    df = ler_snapshot(caminho, origem) if len(conteudo) == info.st_size else None
+    if df is None:
+        df = ler_csv(caminho, conteudo)
+        if len(conteudo) == info.st_size:
+            gravar_snapshot(caminho, df, origem)
+    
+    return df, {
+        'inode': info.st_ino,
+        'cabecalho': cabecalho,
+        'offset': len(conteudo),
+        'cauda': assinatura_cauda(conteudo)
+    }
+
+def ler_linhas_novas(caminho, estado):
+    # Linhas acrescentadas ao arquivo desde 'estado': retorna (linhas novas ou None se não houver, estado novo)
+    # ou None se o arquivo foi truncado ou trocado (recarga completa); 'estado' não é alterado
+    info = os.stat(caminho)
+    with open(caminho, 'rb') as arquivo:
+        cabecalho = arquivo.readline()
+        
+        if (estado['inode'] != info.st_ino or estado['cabecalho'] != cabecalho
+                or info.st_size < estado['offset']):
+            return None
+        
+        # Rotação por cópia e truncamento que já cresceu além do offset: o trecho antes dele mudou
+        inicio_cauda = max(estado['offset'] - TAMANHO_CAUDA_INGESTAO, 0)
+        arquivo.seek(inicio_cauda)
+        if assinatura_cauda(arquivo.read(estado['offset'] - inicio_cauda)) != estado['cauda']:
+            return None
+        
+        novos_bytes = arquivo.read(info.st_size - estado['offset'])
+        # Linha incompleta no fim (escrita em andamento) fica para a próxima leitura
+        novos_bytes = novos_bytes[:novos_bytes.rfind(b'\n') + 1]
+        if not novos_bytes:
+            return None, estado
+        
+        arquivo.seek(max(estado['offset'] + len(novos_bytes) - TAMANHO_CAUDA_INGESTAO, 0))
+        cauda = assinatura_cauda(arquivo.read(estado['offset'] + len(novos_bytes) - arquivo.tell()))
+    
+    novo_estado = {**estado, 'offset': estado['offset'] + len(novos_bytes), 'cauda': cauda}
+    return ler_csv(caminho, cabecalho + novos_bytes), novo_estado
+
+def ler_exportacoes_incremental(chave, caminhos, processos=None):
+    # Ingestão incremental de várias exportações do mesmo tipo: cada arquivo mantém seu offset e o conjunto
+    # concatenado fica em _ESTADO_INGESTAO[chave]; uma exportação nova (ex.: a do dia seguinte) entra inteira
+    # como linhas novas. Recarga de qualquer arquivo já ingerido, ou arquivo removido, relê o conjunto inteiro
+    # Retorna (DataFrame completo, linhas novas) — linhas novas é None quando houve recarga completa
+    # O estado só é gravado no fim: uma falha no meio deixa a próxima carga partir do estado anterior
+    with _TRAVA_INGESTAO:
+        estado = _ESTADO_INGESTAO.get(chave)
+        esquema = esquema_do_arquivo(caminhos[0])
+        
+        arquivos = None
+        if estado is not None and set(estado['arquivos']) <= set(caminhos):
+            arquivos, partes = {}, []
+            for caminho in caminhos:
+                if caminho not in estado['arquivos']:
+                    continue
+                lido = ler_linhas_novas(caminho, estado['arquivos'][caminho])
+                if lido is None:
+                    arquivos = None
+                    break
+                parte, arquivos[caminho] = lido
+                if parte is not None:
+                    partes.append(parte)
+        
+        if arquivos is not None:
+            novos = [caminho for caminho in caminhos if caminho not in arquivos]
+            if novos:
+                for caminho, (parte, estado_arquivo) in zip(novos, ler_em_paralelo(ler_csv_inteiro, novos, processos)):
+                    arquivos[caminho] = estado_arquivo
+                    partes.append(parte)
+            
+            partes = [parte for parte in partes if len(parte)]
+            df = estado['df']
+            novas_linhas = df.iloc[0:0]
+            if partes:
+                novas_linhas = partes[0] if len(partes) == 1 else concatenar_partes(partes, esquema)
+                df = concatenar_partes([df, novas_linhas], esquema)
+            
+            # Atualizado no lugar: o índice, a grade e os agregados derivados continuam valendo
+            estado['arquivos'], estado['df'] = arquivos, df
+            return df.copy(deep=False), novas_linhas
+        
+        # Primeira carga ou recarga: todos os arquivos lidos por inteiro, em paralelo
+        lidos = ler_em_paralelo(ler_csv_inteiro, caminhos, processos)
+        partes = [parte for parte, _ in lidos]
+        df = partes[0] if len(partes) == 1 else concatenar_partes(partes, esquema)
+        _ESTADO_INGESTAO[chave] = {
+            'arquivos': {caminho: estado_arquivo for caminho, (_, estado_arquivo) in zip(caminhos, lidos)},
+            'df': df
+        }
+        return df.copy(deep=False), None
+
+def reiniciar_ingestao():
+    # Descarta offsets e DataFrames acumulados, forçando leitura completa na próxima carga
+    with _TRAVA_INGESTAO:
+        _ESTADO_INGESTAO.clear()
+
+def carregar_dados(caminho_ultima_posicao=None, incremental=False, diretorio=DIRETORIO_DADOS,
+                   data_inicio=None, data_fim=None, processos=None, ao_vivo=False, tamanho_bloco=None):
+    # Função para carregar e processar os arquivos CSV de 'diretorio'
+    # Todas as exportações diárias do período são lidas em paralelo e concatenadas (com ingestão incremental,
+    # na primeira carga; depois só as linhas novas de cada arquivo)
+    # Com 'tamanho_bloco' os movimentos não são carregados: só o índice de posições é montado, bloco a bloco
+    # 'ao_vivo' (com 'incremental') mantém também os agregados dos relatórios, somando só as linhas novas
+    # Erros de leitura são propagados: a interface (ou o modo batch) decide como exibi-los
+    caminho_movimento = os.path.join(diretorio, ARQUIVO_MOVIMENTO)
+    caminho_recebimento = os.path.join(diretorio, ARQUIVO_RECEBIMENTO)
+    
+    # Com ingestão incremental, leitura e atualização do estado acumulado (índice, tags movidas, agregados) são uma
+    # só seção crítica: as cargas do cache_data e do cache_resource podem rodar ao mesmo tempo
+    with _TRAVA_INGESTAO if incremental else nullcontext():
+        novos_movimentos = novos_recebimentos = None
+        exportacoes = descobrir_exportacoes(diretorio, data_inicio, data_fim)
+        # Chaves do estado incremental de cada tipo (o mesmo conjunto de arquivos do modo completo e de versao_dados)
+        chave_movimento, chave_recebimento = ('movimento', diretorio), ('recebimento', diretorio)
+        if incremental:
+            movimento_df, novos_movimentos = ler_exportacoes_incremental(
+                chave_movimento, exportacoes['movimento'] or [caminho_movimento], processos
+            )
+            recebimento_df, novos_recebimentos = ler_exportacoes_incremental(
+                chave_recebimento, exportacoes['recebimento'] or [caminho_recebimento], processos
+            )
+            edicao_df, saldo_edicoes = ler_edicoes_incremental(('edicao', diretorio), exportacoes['edicao'], processos)
+        else:
+            caminhos_movimento = exportacoes['movimento'] or [caminho_movimento]
+            if tamanho_bloco:
+                # Só o cabeçalho, para detectar as colunas; as linhas são percorridas ao montar o índice
+                movimento_df = next(ler_csv_em_blocos(caminhos_movimento[0], 1)).iloc[:0]
+            else:
+                movimento_df = ler_exportacoes(caminhos_movimento, processos)
+            recebimento_df = ler_exportacoes(exportacoes['recebimento'] or [caminho_recebimento], processos)
+            
+            # O razão de edições é opcional: sem ele os relatórios usam só a quantidade recebida
+            edicao_df, saldo_edicoes = None, None
+            if exportacoes['edicao']:
+                edicao_df, saldo_edicoes = historico_edicoes(ler_exportacoes(exportacoes['edicao'], processos))
+        
+        rfid_col_movimento = [col for col in movimento_df.columns if 'rfid' in col.lower()]
+        rfid_col_recebimento = [col for col in recebimento_df.columns if 'rfid' in col.lower()]
+        
+        # Ordenados por tempo para que recortes de período sejam buscas binárias
+        recebimento_df = ordenar_por_tempo(normalizar_recebimento(recebimento_df), 'timestamp')
+        movimento_df = ordenar_por_tempo(movimento_df, 'moved_at')
+        
+        indice_posicoes = indice_anterior = posicoes_novas = None
+        estado_movimento = _ESTADO_INGESTAO.get(chave_movimento, {}) if incremental else {}
+        if rfid_col_movimento:
+            if novos_movimentos is not None and estado_movimento.get('indice_posicoes') is not None:
+                # Só os movimentos acrescentados atualizam o índice
+                indice_anterior = estado_movimento['indice_posicoes']
+                posicoes_novas = construir_indice_posicoes(novos_movimentos, rfid_col_movimento[0])
+                indice_posicoes = atualizar_indice_posicoes(indice_anterior, posicoes_novas)
+            else:
+                if tamanho_bloco:
+                    indice_posicoes, ruas_por_alias = indice_posicoes_em_blocos(
+                        caminhos_movimento, rfid_col_movimento[0], tamanho_bloco
+                    )
+                    movimento_df.attrs['linhas_descartadas'] = indice_posicoes.attrs['linhas_descartadas']
+                else:
+                    indice_posicoes = construir_indice_posicoes(movimento_df, rfid_col_movimento[0])
+                    ruas_por_alias = movimento_df
+                if caminho_ultima_posicao and os.path.exists(caminho_ultima_posicao):
+                    indice_posicoes = atualizar_indice_posicoes(
+                        carregar_indice_ultima_posicao(caminho_ultima_posicao, ruas_por_alias),
+                        indice_posicoes
+                    )
+            
+            if incremental and estado_movimento:
+                estado_movimento['indice_posicoes'] = indice_posicoes
+                # Tags movidas desde a última grade de ocupação, que grade_ocupacao reposiciona sem reconstruir
+                if posicoes_novas is not None:
+                    estado_movimento['tags_movidas'] = estado_movimento.get('tags_movidas', pd.Index([])).union(posicoes_novas.index)
+                else:
+                    estado_movimento.pop('grade_ocupacao', None)
+        
+        # Cada carga incremental tem uma geração; estruturas derivadas guardam a geração de onde saíram
+        geracao_anterior = estado_movimento.get('geracao')
+        if estado_movimento:
+            estado_movimento['geracao'] = next(_GERACOES_INGESTAO)
+        
+        agregados = None
+        if incremental and ao_vivo:
+            estado_recebimento = _ESTADO_INGESTAO.get(chave_recebimento, {})
+            # Agregados de antes de uma carga sem 'ao_vivo' não incluem as linhas novas dela: são reconstruídos
+            geracao_agregados, anteriores = estado_recebimento.get('agregados', (None, None))
+            
+            rfid_col = rfid_col_recebimento[0] if rfid_col_recebimento else None
+            if (anteriores is not None and geracao_agregados == geracao_anterior and novos_recebimentos is not None
+                    and (posicoes_novas is not None or not rfid_col_movimento)):
+                agregados = atualizar_agregados(
+                    anteriores,
+                    recebimento_df,
+                    normalizar_recebimento(novos_recebimentos.copy(deep=False)),
+                    rfid_col,
+                    indice_anterior,
+                    indice_posicoes,
+                    posicoes_novas.index if posicoes_novas is not None else pd.Index([])
+                )
+            else:
+                agregados = construir_agregados(recebimento_df, rfid_col, indice_posicoes)
+            
+            if estado_recebimento:
+                estado_recebimento['agregados'] = (estado_movimento.get('geracao'), agregados)
+    
+    
+    return {
+        'movimento': movimento_df,
+        'movimento_em_blocos': bool(tamanho_bloco) and not incremental,
+        'recebimento': recebimento_df,
+        'rfid_col_movimento': rfid_col_movimento[0] if rfid_col_movimento else None,
+        'rfid_col_recebimento': rfid_col_recebimento[0] if rfid_col_recebimento else None,
+        'indice_posicoes': indice_posicoes,
+        # Estado incremental de onde estes dados saíram (chave e geração), para a grade de ocupação
+        'ingestao': (chave_movimento, estado_movimento['geracao']) if 'geracao' in estado_movimento else None,
+        'agregados': agregados,
+        'edicao': edicao_df,
+        'saldo_edicoes': saldo_edicoes,
+        'memoria': {
+            'Movimento': movimento_df.attrs.get('memoria'),
+            'Recebimento': recebimento_df.attrs.get('memoria'),
+            'Edição': edicao_df.attrs.get('memoria') if edicao_df is not None else None
+        },
+        'linhas_descartadas': {
+            'Movimento': movimento_df.attrs.get('linhas_descartadas', 0),
+            'Recebimento': recebimento_df.attrs.get('linhas_descartadas', 0),
+            'Edição': edicao_df.attrs.get('linhas_descartadas', 0) if edicao_df is not None else 0
+        }
+    }
+
+def construir_agregados(recebimento_df, rfid_col, indice_posicoes):
+    # Somas aditivas dos relatórios do modo ao vivo: por SKU, pallets agrupados (cada intervalo) e armazenamento
+    # O armazenamento só é mantido com RFID e índice de posições; sem eles (ou sem ruas) o relatório é recalculado
+    agregados = {
+        'sku': somas_por_sku(recebimento_df),
+        'pallets_agrupados': {
+            minutos: contagens_pallets_agrupados(recebimento_df, rfid_col, minutos) for minutos in INTERVALOS_PALLETS
+        },
+        'armazenamento': None,
+        'primeiros_recebimentos': None,
+        'ruas': []
+    }
+    
+    if rfid_col and indice_posicoes is not None and 'name' in indice_posicoes.columns:
+        agregados['armazenamento'] = somas_armazenamento_por_tag(recebimento_df, rfid_col, indice_posicoes['name'])
+        agregados['primeiros_recebimentos'] = primeiro_recebimento_por_tag(recebimento_df, rfid_col)
+        agregados['ruas'] = ruas_por_primeiro_recebimento(agregados['primeiros_recebimentos'], indice_posicoes['name'])
+    
+    return agregados
+
+def atualizar_agregados(agregados, recebimento_df, novos_recebimentos, rfid_col, indice_anterior, indice_posicoes, tags_movidas):
+    # Soma aos agregados o lote novo de recebimentos e troca de rua os recebimentos das tags que se moveram
+    # 'recebimento_df' já inclui o lote novo; 'indice_anterior' é o índice de posições antes dos movimentos novos
+    atualizados = {
+        'sku': combinar_somas_por_sku(agregados['sku'], somas_por_sku(novos_recebimentos)),
+        'pallets_agrupados': {
+            minutos: pd.concat([contagens, contagens_pallets_agrupados(novos_recebimentos, rfid_col, minutos)])
+            .groupby(level=['HH:MM', 'Local', 'admin_username']).sum()
+            for minutos, contagens in agregados['pallets_agrupados'].items()
+        },
+        'armazenamento': None,
+        'primeiros_recebimentos': None,
+        'ruas': []
+    }
+    
+    if agregados['armazenamento'] is not None:
+        rua_anterior, rua_atual = indice_anterior['name'], indice_posicoes['name']
+        movidos = recebimento_df[recebimento_df[rfid_col].isin(tags_movidas)]
+        novos_movidos = novos_recebimentos[rfid_col].isin(tags_movidas)
+        
+        # Recebimentos antigos das tags movidas saem da rua anterior e entram na atual; os novos entram na atual
+        partes = [
+            (agregados['armazenamento'], 1),
+            (somas_armazenamento_por_tag(movidos, rfid_col, rua_atual), 1),
+            (somas_armazenamento_por_tag(movidos, rfid_col, rua_anterior), -1),
+            (somas_armazenamento_por_tag(novos_recebimentos[novos_movidos], rfid_col, rua_anterior), 1),
+            (somas_armazenamento_por_tag(novos_recebimentos[~novos_movidos], rfid_col, rua_atual), 1)
+        ]
+        
+        somas = pd.concat([parte * sinal for parte, sinal in partes]).groupby(level=['faixa', 'rua']).sum()
+        somas = somas[somas['pallets'] > 0].astype(agregados['armazenamento'].dtypes)
+        
+        primeiros = pd.concat([
+            agregados['primeiros_recebimentos'], primeiro_recebimento_por_tag(novos_recebimentos, rfid_col)
+        ]).groupby(level=0, sort=False).min()
+        
+        atualizados['armazenamento'] = somas
+        atualizados['primeiros_recebimentos'] = primeiros
+        atualizados['ruas'] = ruas_por_primeiro_recebimento(primeiros, rua_atual)
+    
+    return atualizados
+
+def somas_armazenamento_por_tag(recebimento_df, rfid_col, rua_por_tag):
+    # Somas do armazenamento com a rua atual de cada tag
+    rua = recebimento_df[rfid_col].map(rua_por_tag)
+    return somas_armazenamento(faixa_horario(recebimento_df['timestamp']), rua, recebimento_df['initial_quantity'])
+
+def primeiro_recebimento_por_tag(recebimento_df, rfid_col):
+    # Horário do primeiro recebimento de cada tag; com um lote novo basta o mínimo entre o anterior e o do lote
+    return recebimento_df.groupby(recebimento_df[rfid_col].astype(object), sort=False)['timestamp'].min()
+
+def ruas_por_primeiro_recebimento(primeiros_recebimentos, rua_por_tag):
+    # Ruas na ordem do primeiro recebimento de uma tag que está nelas, como as colunas do armazenamento completo
+    rua = rua_por_tag.reindex(primeiros_recebimentos.index).astype(object)
+    primeiro_por_rua = primeiros_recebimentos.groupby(rua.to_numpy(), sort=False).min()
+    return primeiro_por_rua.sort_values(kind='stable').index.tolist()
+
+def normalizar_recebimento(recebimento_df):
+    # 'initial_quantity' passa a numérico (coordenadas ausentes já viram 0 pelo esquema)
+    if 'initial_quantity' in recebimento_df.columns:
+        recebimento_df['initial_quantity'] = pd.to_numeric(recebimento_df['initial_quantity'], errors='coerce').fillna(0)
+    
+    return recebimento_df
+
+def historico_edicoes(edicao_df, saldo_anterior=None):
+    # Razão de edições (CRATE_PRODUCT_UPDATE) em ordem de timestamp e saldo atual por pallet (tag RFID) e SKU
+    # 'saldo_anterior' é o saldo por pallet/SKU das edições já aplicadas: só as edições novas são somadas a ele
+    # Retorna (edições, saldo atual por pallet/SKU) ou (edições, None) sem as colunas do razão
+    rfid_col = next((col for col in edicao_df.columns if 'rfid' in col.lower()), None)
+    if rfid_col is None or not {'sku', 'edit_quantity'} <= set(edicao_df.columns):
+        return edicao_df, None
+    
+    edicoes = ordenar_por_tempo(edicao_df, 'timestamp')
+    quantidade = pd.to_numeric(edicoes['edit_quantity'], errors='coerce').fillna(0)
+    saldo = quantidade.groupby(chaves_pallet(edicoes, rfid_col)).sum()
+    
+    if saldo_anterior is not None:
+        saldo = saldo_anterior.add(saldo, fill_value=0).astype(quantidade.dtype)
+    
+    return edicoes, saldo
+
+def chaves_pallet(df, rfid_col):
+    # Chaves (tag RFID, SKU) como texto; valores ausentes viram 'nan' para não sumirem nos agrupamentos
+    return [
+        df[rfid_col].astype(str).fillna('nan').rename('tag_rfid'),
+        df['sku'].astype(str).fillna('nan').rename('sku')
+    ]
+
+def ler_edicoes_incremental(chave, caminhos, processos=None):
+    # Razão de edições com ingestão incremental: edições acrescentadas atualizam o saldo sem reprocessar o histórico
+    if not caminhos:
+        return None, None
+    
+    edicao_df, novas_edicoes = ler_exportacoes_incremental(chave, caminhos, processos)
+    estado = _ESTADO_INGESTAO.get(chave, {})
+    
+    if novas_edicoes is not None and estado.get('edicoes') is not None:
+        historico, saldo = estado['edicoes']
+        if len(novas_edicoes) and saldo is not None:
+            novas, saldo = historico_edicoes(novas_edicoes, saldo)
+            # Categorias unificadas antes do concat: o esquema não precisa recodificar o histórico inteiro
+            historico = ordenar_por_tempo(
+                aplicar_esquema(
+                    pd.concat(unificar_categorias([historico, novas], ESQUEMA_EDICAO['categoricas']), ignore_index=True),
+                    ESQUEMA_EDICAO
+                ),
+                'timestamp'
+            )
+            historico.attrs.update({atributo: edicao_df.attrs[atributo] for atributo in ('memoria', 'linhas_descartadas')
+                                    if atributo in edicao_df.attrs})
+    else:
+        historico, saldo = historico_edicoes(edicao_df)
+    
+    if estado:
+        estado['edicoes'] = (historico, saldo)
+    return historico, saldo
+
+def ordenar_por_tempo(df, coluna):
+    # Ordena 'df' por 'coluna' (NaT primeiro) e marca a ordenação em attrs; arquivos já em ordem não são copiados
+    if coluna not in df.columns or not isinstance(df[coluna].dtype, (pd.DatetimeTZDtype, np.dtypes.DateTime64DType)):
+        return df
+    
+    valores = df[coluna].array.asi8
+    if len(valores) > 1 and not (valores[1:] >= valores[:-1]).all():
+        df = df.sort_values(coluna, kind='stable', na_position='first', ignore_index=True)
+    
+    df.attrs['ordenado_por'] = coluna
+    return df
+
+def alinhar_fuso(momento, serie):
+    # Converte 'momento' para o fuso da série; horários sem fuso (ex.: da interface) são tomados como locais
+    momento = pd.Timestamp(momento)
+    fuso = getattr(serie.dt, 'tz', None)
+    
+    if fuso is None:
+        return momento.tz_localize(None) if momento.tzinfo is not None else momento
+    return momento.tz_localize(fuso) if momento.tzinfo is None else momento.tz_convert(fuso)
+
+def fatiar_periodo(df, coluna, inicio=None, fim=None):
+    # Linhas com inicio <= coluna <= fim por busca binária: O(log n) + fatia, sem copiar o DataFrame
+    # Sem ordenação registrada em attrs (ver ordenar_por_tempo), ordena antes de recortar
+    if df.attrs.get('ordenado_por') != coluna:
+        df = ordenar_por_tempo(df, coluna)
+    
+    serie = df[coluna]
+    # NaT fica no começo (menor inteiro) e nunca entra no período
+    primeiro = int(np.searchsorted(serie.array.asi8, np.iinfo(np.int64).min, side='right'))
+    ultimo = len(df)
+    
+    if inicio is not None:
+        primeiro = max(primeiro, int(serie.searchsorted(alinhar_fuso(inicio, serie), side='left')))
+    if fim is not None:
+        ultimo = int(serie.searchsorted(alinhar_fuso(fim, serie), side='right'))
+    
+    return df.iloc[primeiro:max(primeiro, ultimo)]
+
+def limites_periodo(df, coluna):
+    # Primeiro e último instante de 'df' ordenado por 'coluna' (None se não houver datas válidas)
+    periodo = fatiar_periodo(df, coluna)
+    if periodo.empty:
+        return None, None
+    return periodo[coluna].iloc[0], periodo[coluna].iloc[-1]
+
+@medido('construir_indice_posicoes')
+def construir_indice_posicoes(movimento_df, rfid_col, ate=None):
+    # Índice tag RFID -> posição mais recente ('name', 'ground_position_alias', x/y/z e 'type') segundo 'moved_at'
+    colunas = [col for col in ['name', 'ground_position_alias', 'x', 'y', 'z', 'type'] if col in movimento_df.columns]
+    movimentos = movimento_df[[rfid_col] + colunas].copy()
+    
+    if 'moved_at' in movimento_df.columns:
+        movimentos['moved_at'] = pd.to_datetime(movimento_df['moved_at'], errors='coerce')
+    else:
+        movimentos['moved_at'] = pd.NaT
+    
+    if ate is not None:
+        movimentos = movimentos[movimentos['moved_at'] <= pd.to_datetime(ate)]
+    
+    # Tags vazias não identificam pallet e, na junção, casariam entre si
+    tags = movimentos[rfid_col].astype(str).str.strip()
+    movimentos = movimentos[movimentos[rfid_col].notna() & ~tags.isin(['', 'nan', 'None'])]
+    
+    indice = (
+        movimentos.sort_values('moved_at', kind='stable', na_position='first')
+        .drop_duplicates(rfid_col, keep='last')
+        .set_index(rfid_col)
+    )
+    indice.index.name = 'tag_rfid'
+    
+    return indice
+
+def atualizar_indice_posicoes(indice, novas_posicoes):
+    # Incorpora posições novas ao índice sem reprocessar o histórico de movimentos
+    comuns = novas_posicoes.index.intersection(indice.index)
+    desatualizadas = comuns[
+        (novas_posicoes.loc[comuns, 'moved_at'] < indice.loc[comuns, 'moved_at']).to_numpy()
+    ]
+    novas_posicoes = novas_posicoes.drop(desatualizadas)
+    
+    return pd.concat([indice.drop(novas_posicoes.index, errors='ignore'), novas_posicoes])
+
+def carregar_indice_ultima_posicao(caminho, movimento_df=None):
+    # Índice inicial a partir do export de última posição; a rua ('name') é resolvida pelo alias nos movimentos
+    ultima_posicao_df = ler_csv(caminho)
+    
+    posicoes = pd.DataFrame({
+        'tag_rfid': ultima_posicao_df['tag_rfid'],
+        'ground_position_alias': ultima_posicao_df['alias'].astype(str),
+        'moved_at': ultima_posicao_df['timestamp']
+    })
+    for col in ['x', 'y', 'z', 'type']:
+        if col in ultima_posicao_df.columns:
+            posicoes[col] = ultima_posicao_df[col]
+    
+    if movimento_df is not None and {'ground_position_alias', 'name'} <= set(movimento_df.columns):
+        ruas_por_alias = movimento_df.dropna(subset=['name']).drop_duplicates('ground_position_alias', keep='last')
+        posicoes['name'] = posicoes['ground_position_alias'].map(
+            ruas_por_alias.set_index('ground_position_alias')['name']
+        )
+    else:
+        posicoes['name'] = np.nan
+    
+    return construir_indice_posicoes(posicoes, 'tag_rfid')
+
+@medido('codigos_quantidades')
+def codigos_quantidades(recebimento_df, saldo_edicoes=None, somas=None):
+    # Relatório de códigos e quantidades recebidas
+    # Com o saldo das edições, 'Qtd no Quantum' passa a ser a quantidade líquida (recebida + ajustes)
+    # 'somas' (somas_por_sku já acumuladas pelo modo ao vivo) dispensa o groupby sobre o recebimento
+    if somas is None:
+        somas = somas_por_sku(recebimento_df)
+    resultado = somas['soma'].reset_index()
+    resultado.columns = ['Código do Item', 'Qtd no Quantum']
+    
+    if saldo_edicoes is not None:
+        recebida = resultado.set_index(resultado['Código do Item'].astype(str))['Qtd no Quantum']
+        ajustes = saldo_edicoes.groupby(level='sku').sum()
+        ajustes = ajustes[ajustes.index != 'nan']
+        
+        codigos = recebida.index.union(ajustes.index)
+        recebida = recebida.reindex(codigos, fill_value=0)
+        ajustes = ajustes.reindex(codigos, fill_value=0)
+        
+        resultado = pd.DataFrame({
+            'Código do Item': codigos,
+            'Qtd no Quantum': (recebida + ajustes).to_numpy(),
+            'Qtd Recebida': recebida.to_numpy(),
+            'Ajustes de Edição': ajustes.to_numpy()
+        })
+    
+    resultado = resultado.sort_values('Código do Item')
+    
+    return resultado
+
+@medido('total_pallets_por_sku')
+def total_pallets_por_sku(recebimento_df, saldo_edicoes=None, rfid_col=None, somas=None):
+    # Relatório de estatísticas de pallets por SKU (com o saldo das edições, sobre a quantidade líquida de cada pallet)
+    # 'somas' só vale sem o saldo das edições: a quantidade líquida de cada pallet não é somável por lote
+    if saldo_edicoes is not None and rfid_col and rfid_col in recebimento_df.columns:
+        recebimento_df = recebimento_df.assign(initial_quantity=quantidade_liquida(recebimento_df, rfid_col, saldo_edicoes))
+        somas = None
+    
+    if somas is None:
+        somas = somas_por_sku(recebimento_df)
+    
+    stats = pd.DataFrame({
+        'Total de Pallets': somas['contagem'],
+        'Média por Pallet': somas['soma'] / somas['contagem'],
+        'Mínimo por Pallet': somas['minimo'],
+        'Máximo por Pallet': somas['maximo']
+    }).rename_axis('Código do Item').reset_index()
+    
+    stats['Média por Pallet'] = stats['Média por Pallet'].round(2)
+    
+    stats = stats.sort_values('Código do Item')
+    
+    return stats
+
+def somas_por_sku(recebimento_df):
+    # Soma, contagem, mínimo e máximo de 'initial_quantity' por SKU, combináveis entre lotes de linhas
+    return recebimento_df.groupby('sku', observed=True)['initial_quantity'].agg([
+        ('soma', 'sum'),
+        ('contagem', 'count'),
+        ('minimo', 'min'),
+        ('maximo', 'max')
+    ])
+
+def combinar_somas_por_sku(somas, novas):
+    # Acumula as somas por SKU de um lote novo de recebimentos
+    juntas = pd.concat([somas, novas])
+    juntas.index = juntas.index.astype(str)
+    agrupadas = juntas.groupby(level=0)
+    
+    return pd.DataFrame({
+        'soma': agrupadas['soma'].sum(),
+        'contagem': agrupadas['contagem'].sum(),
+        'minimo': agrupadas['minimo'].min(),
+        'maximo': agrupadas['maximo'].max()
+    }).rename_axis('sku')
+
+def quantidade_liquida(recebimento_df, rfid_col, saldo_edicoes):
+    # Quantidade de cada recebimento somada ao saldo de edições do seu pallet/SKU
+    # O ajuste entra só no recebimento mais recente de cada pallet/SKU (recebimento_df ordenado por timestamp)
+    chaves = pd.MultiIndex.from_arrays(chaves_pallet(recebimento_df, rfid_col))
+    
+    ajuste = saldo_edicoes.reindex(chaves).fillna(0).to_numpy(copy=True)
+    ajuste[chaves.duplicated(keep='last') | recebimento_df[rfid_col].isna().to_numpy()] = 0
+    
+    return recebimento_df['initial_quantity'] + ajuste
+
+@medido('quantidades_por_pallet')
+def quantidades_por_pallet(recebimento_df, rfid_col, saldo_edicoes):
+    # Relatório da quantidade líquida atual por pallet (tag RFID) e SKU: recebida + saldo das edições
+    # Pallets editados sem recebimento no período também aparecem, com recebido 0
+    com_tag = recebimento_df[recebimento_df[rfid_col].notna()]
+    recebida = com_tag['initial_quantity'].groupby(chaves_pallet(com_tag, rfid_col)).sum()
+    
+    ajustes = saldo_edicoes[saldo_edicoes.index.get_level_values('tag_rfid') != 'nan']
+    pallets = recebida.index.union(ajustes.index)
+    
+    resultado = pd.DataFrame({
+        'Qtd Recebida': recebida.reindex(pallets, fill_value=0),
+        'Ajustes de Edição': ajustes.reindex(pallets, fill_value=0)
+    })
+    resultado['Qtd Líquida'] = resultado['Qtd Recebida'] + resultado['Ajustes de Edição']
+    
+    resultado = resultado.reset_index().rename(columns={'tag_rfid': 'Tag RFID', 'sku': 'Código do Item'})
+    
+    return resultado.sort_values(['Código do Item', 'Tag RFID'], ignore_index=True)
+
+def quantidade_por_tag(recebimento_df, rfid_col, saldo_edicoes=None):
+    # Quantidade atual de cada pallet (tag RFID): recebida mais o saldo das edições, se houver
+    com_tag = recebimento_df[recebimento_df[rfid_col].notna()]
+    quantidades = com_tag['initial_quantity'].groupby(com_tag[rfid_col].astype(str).rename('tag_rfid')).sum()
+    
+    if saldo_edicoes is not None:
+        ajustes = saldo_edicoes.groupby(level='tag_rfid').sum()
+        quantidades = quantidades.add(ajustes[ajustes.index != 'nan'], fill_value=0)
+    
+    return quantidades
+
+def posicoes_ocupadas(indice_posicoes, tipos=TIPOS_OCUPACAO):
+    # Posições atuais que ocupam o armazém: por padrão, pallets cujo último movimento foi STOCK
+    # Coordenadas (0, 0, 0) são as ausentes no export (o esquema preenche com 0) e ficam de fora
+    if not {'x', 'y', 'z'} <= set(indice_posicoes.columns):
+        return indice_posicoes.iloc[0:0]
+    
+    ocupadas = (indice_posicoes[['x', 'y', 'z']] != 0).any(axis=1)
+    if tipos and 'type' in indice_posicoes.columns:
+        ocupadas &= indice_posicoes['type'].isin(tipos)
+    
+    return indice_posicoes[ocupadas]
+
+def celulas_ocupacao(posicoes, origem, forma, tamanho_z):
+    # Índice linear da célula (x, y, faixa de z) de cada posição; -1 para posições fora da grade
+    x = posicoes['x'].to_numpy(np.int64) - origem[0]
+    y = posicoes['y'].to_numpy(np.int64) - origem[1]
+    z = (posicoes['z'].to_numpy(np.int64) - origem[2]) // tamanho_z
+    
+    dentro = (x >= 0) & (x < forma[0]) & (y >= 0) & (y < forma[1]) & (z >= 0) & (z < forma[2])
+    return np.where(dentro, (x * forma[1] + y) * forma[2] + z, -1)
+
+@medido('construir_grade_ocupacao')
+def construir_grade_ocupacao(indice_posicoes, quantidades=None, tamanho_z=TAMANHO_CELULA_Z, tipos=TIPOS_OCUPACAO):
+    # Grade densa (x, y, faixa de z) com pallets e quantidade por célula, por bincount das coordenadas linearizadas
+    # Guarda a célula e o peso de cada tag ('tags') para que atualizar_grade_ocupacao só mexa nas tags alteradas
+    # Com mais de LIMITE_CELULAS_GRADE células a grade é esparsa: 'celulas' lista os índices lineares ocupados
+    # (np.unique) e 'contagem'/'quantidade' são vetores alinhados a ela; na densa 'celulas' é None
+    posicoes = posicoes_ocupadas(indice_posicoes, tipos)
+    
+    if len(posicoes):
+        minimos = posicoes[['x', 'y', 'z']].min().astype(np.int64)
+        maximos = posicoes[['x', 'y', 'z']].max().astype(np.int64)
+        # Faixas de z alinhadas a múltiplos de 'tamanho_z' (0 a 99, 100 a 199, ...)
+        origem = (int(minimos['x']), int(minimos['y']), int(minimos['z']) // tamanho_z * tamanho_z)
+        forma = (
+            int(maximos['x']) - origem[0] + 1,
+            int(maximos['y']) - origem[1] + 1,
+            (int(maximos['z']) - origem[2]) // tamanho_z + 1
+        )
+    else:
+        origem, forma = (0, 0, 0), (1, 1, 1)
+    
+    celulas = celulas_ocupacao(posicoes, origem, forma, tamanho_z)
+    pesos = np.zeros(len(posicoes))
+    if quantidades is not None:
+        pesos = quantidades.reindex(posicoes.index).fillna(0).to_numpy(dtype=float)
+    
+    ocupadas, total = None, np.prod(forma)
+    if total > LIMITE_CELULAS_GRADE:
+        ocupadas, celulas = np.unique(celulas, return_inverse=True)
+        total = len(ocupadas)
+    
+    contagem = np.bincount(celulas, minlength=total)
+    quantidade = np.bincount(celulas, weights=pesos, minlength=total)
+    return {
+        'contagem': contagem if ocupadas is not None else contagem.reshape(forma),
+        'quantidade': quantidade if ocupadas is not None else quantidade.reshape(forma),
+        'celulas': ocupadas,
+        'forma': forma,
+        'origem': origem,
+        'tamanho_z': tamanho_z,
+        'tipos': tipos,
+        'tags': pd.DataFrame({'celula': celulas, 'peso': pesos}, index=posicoes.index)
+    }
+
+def atualizar_grade_ocupacao(grade, indice_posicoes, tags, quantidades=None):
+    # Atualiza a grade só para as tags alteradas (movidas ou com quantidade nova): retira a contribuição
+    # anterior de cada uma e soma a atual; retorna None se uma posição nova cair fora da grade (reconstruir)
+    # Na grade esparsa, uma posição numa célula que ainda não estava ocupada também pede reconstrução
+    tags = pd.Index(tags).unique()
+    tabela = grade['tags']
+    
+    linhas = indice_posicoes.index.get_indexer(tags)
+    atuais = posicoes_ocupadas(indice_posicoes.iloc[linhas[linhas >= 0]], grade['tipos'])
+    novas_celulas = celulas_ocupacao(atuais, grade['origem'], grade['forma'], grade['tamanho_z'])
+    if grade['celulas'] is not None:
+        novas_celulas = pd.Index(grade['celulas']).get_indexer(novas_celulas)
+    if (novas_celulas < 0).any():
+        return None
+    
+    # Célula -1: a tag não ocupa a grade (saiu do STOCK ou não tem coordenadas)
+    celulas = np.full(len(tags), -1, dtype=np.int64)
+    pesos = np.zeros(len(tags))
+    onde = tags.get_indexer(atuais.index)
+    celulas[onde] = novas_celulas
+    if quantidades is not None:
+        pesos[onde] = quantidades.reindex(atuais.index).fillna(0).to_numpy(dtype=float)
+    
+    posicao_tags = tabela.index.get_indexer(tags)
+    conhecidas = posicao_tags >= 0
+    celula = tabela['celula'].to_numpy(copy=True)
+    peso = tabela['peso'].to_numpy(copy=True)
+    celulas_anteriores = celula[posicao_tags[conhecidas]]
+    pesos_anteriores = peso[posicao_tags[conhecidas]]
+    ocupavam = celulas_anteriores >= 0
+    ocupam = celulas >= 0
+    
+    contagem = grade['contagem'].copy()
+    quantidade = grade['quantidade'].copy()
+    np.subtract.at(contagem.reshape(-1), celulas_anteriores[ocupavam], 1)
+    np.subtract.at(quantidade.reshape(-1), celulas_anteriores[ocupavam], pesos_anteriores[ocupavam])
+    np.add.at(contagem.reshape(-1), celulas[ocupam], 1)
+    np.add.at(quantidade.reshape(-1), celulas[ocupam], pesos[ocupam])
+    
+    # Tags já conhecidas são atualizadas no lugar; as novas que ocupam a grade entram no fim
+    celula[posicao_tags[conhecidas]] = celulas[conhecidas]
+    peso[posicao_tags[conhecidas]] = pesos[conhecidas]
+    entram = ~conhecidas & ocupam
+    
+    return {
+        **grade,
+        'contagem': contagem,
+        'quantidade': quantidade,
+        'tags': pd.concat([
+            pd.DataFrame({'celula': celula, 'peso': peso}, index=tabela.index),
+            pd.DataFrame({'celula': celulas[entram], 'peso': pesos[entram]}, index=tags[entram])
+        ])
+    }
+
+def grade_ocupacao(dados):
+    # Grade de ocupação dos dados carregados; com ingestão incremental parte da última grade construída e
+    # só reposiciona as tags movidas desde então ou com quantidade alterada
+    indice_posicoes = dados.get('indice_posicoes')
+    if indice_posicoes is None:
+        return None
+    
+    recebimento_df, rfid_col = dados['recebimento'], dados.get('rfid_col_recebimento')
+    quantidades = None
+    if rfid_col and 'initial_quantity' in recebimento_df.columns:
+        quantidades = quantidade_por_tag(recebimento_df, rfid_col, dados.get('saldo_edicoes'))
+    
+    chave, geracao = dados.get('ingestao') or (None, None)
+    with _TRAVA_INGESTAO:
+        estado = _ESTADO_INGESTAO.get(chave, {})
+        # Dados de uma carga anterior à última ingestão não correspondem às tags movidas acumuladas
+        atual = chave is not None and estado.get('geracao') == geracao
+        
+        grade = None
+        anterior = estado.get('grade_ocupacao') if atual else None
+        if anterior is not None:
+            alteradas = estado.get('tags_movidas', pd.Index([]))
+            if quantidades is not None:
+                ocupando = anterior['tags'][anterior['tags']['celula'] >= 0]
+                atuais = quantidades.reindex(ocupando.index).fillna(0).to_numpy()
+                alteradas = alteradas.union(ocupando.index[atuais != ocupando['peso'].to_numpy()])
+            grade = atualizar_grade_ocupacao(anterior, indice_posicoes, alteradas, quantidades)
+        
+        if grade is None:
+            grade = construir_grade_ocupacao(indice_posicoes, quantidades)
+        
+        if atual:
+            estado['grade_ocupacao'] = grade
+            estado['tags_movidas'] = pd.Index([])
+    
+    return grade
+
+def mapa_ocupacao(grade, faixa_z=None):
+    # Células (x, y) ocupadas com pallets e quantidade, somando todas as faixas de z ou só a faixa escolhida
+    if grade['celulas'] is not None:
+        return mapa_ocupacao_esparsa(grade, faixa_z)
+    
+    if faixa_z is None:
+        contagem, quantidade = grade['contagem'].sum(axis=2), grade['quantidade'].sum(axis=2)
+    else:
+        contagem, quantidade = grade['contagem'][:, :, faixa_z], grade['quantidade'][:, :, faixa_z]
+    
+    ix, iy = np.nonzero(contagem)
+    return pd.DataFrame({
+        'x': ix + grade['origem'][0],
+        'y': iy + grade['origem'][1],
+        'Pallets': contagem[ix, iy],
+        'Quantidade': quantidade[ix, iy].round(2)
+    }).sort_values(['Pallets', 'Quantidade'], ascending=False, ignore_index=True)
+
+def mapa_ocupacao_esparsa(grade, faixa_z=None):
+    # mapa_ocupacao da grade esparsa: as células ocupadas são decompostas em (x, y, faixa de z) e somadas por (x, y)
+    ix, iy, iz = np.unravel_index(grade['celulas'], grade['forma'])
+    celulas = pd.DataFrame({
+        'x': ix + grade['origem'][0],
+        'y': iy + grade['origem'][1],
+        'Pallets': grade['contagem'],
+        'Quantidade': grade['quantidade']
+    })[(grade['contagem'] > 0) & ((iz == faixa_z) if faixa_z is not None else True)]
+    
+    mapa = celulas.groupby(['x', 'y'], sort=True)[['Pallets', 'Quantidade']].sum().reset_index()
+    mapa['Quantidade'] = mapa['Quantidade'].round(2)
+    return mapa.sort_values(['Pallets', 'Quantidade'], ascending=False, ignore_index=True)
+
+def faixas_z_ocupadas(grade):
+    # Rótulos das faixas de z com algum pallet, na forma {índice da faixa: 'z inicial a z final'}
+    inicio, tamanho = grade['origem'][2], grade['tamanho_z']
+    if grade['celulas'] is not None:
+        faixas = np.unique(np.unravel_index(grade['celulas'], grade['forma'])[2][grade['contagem'] > 0])
+    else:
+        faixas = np.nonzero(grade['contagem'].sum(axis=(0, 1)))[0]
+    
+    return {int(faixa): f"{inicio + faixa * tamanho} a {inicio + (faixa + 1) * tamanho - 1}" for faixa in faixas}
+
+def chave_local(recebimento_df):
+    # Chave 'x,y,z' de localização usada para agrupar pallets
+    # O texto é montado só para as combinações distintas de coordenadas e expandido pelos códigos
+    coordenadas = pd.DataFrame({
+        col: pd.to_numeric(recebimento_df[col], errors='coerce').fillna(0).astype(np.int64)
+        for col in ['x', 'y', 'z']
+    })
+    codigos, combinacoes = pd.MultiIndex.from_frame(coordenadas).factorize()
+    
+    rotulos = (
+        combinacoes.get_level_values(0).astype(str) + ',' +
+        combinacoes.get_level_values(1).astype(str) + ',' +
+        combinacoes.get_level_values(2).astype(str)
+    )
+    
+    return pd.Series(np.asarray(rotulos, dtype=object)[codigos], index=recebimento_df.index)
+
+def faixa_horario(timestamps, minutos=1):
+    # Rótulo 'HH:MM' do início da faixa de 'minutos' minutos, calculado por aritmética inteira
+    minuto_do_dia = timestamps.dt.hour * 60 + timestamps.dt.minute
+    validos = minuto_do_dia.notna()
+    
+    faixa = pd.Series(np.nan, index=timestamps.index, dtype=object)
+    faixa[validos] = ROTULOS_MINUTO[(minuto_do_dia[validos].astype(np.int64) // minutos) * minutos]
+    
+    return faixa
+
+def adicionar_total_pallets(pivot):
+    # Acrescenta a linha 'Total' ao pivot de pallets agrupados
+    totais = pivot.sum(numeric_only=True)
+    totais_row = pd.DataFrame([['Total', ''] + totais.tolist()], 
+                            columns=pivot.columns)
+    
+    return pd.concat([pivot, totais_row], ignore_index=True)
+
+@medido('pallets_agrupados')
+def pallets_agrupados(recebimento_df, rfid_col=None, minutos=1):
+    # Relatório de pallets agrupados por horário (faixas de 'minutos' minutos), local e usuário
+    return tabela_pallets_agrupados(contagens_pallets_agrupados(recebimento_df, rfid_col, minutos))
+
+def contagens_pallets_agrupados(recebimento_df, rfid_col=None, minutos=1):
+    # Pallets por faixa de horário, local e usuário; as contagens são somáveis entre lotes de linhas
+    # Trabalha sobre um DataFrame próprio, sem alterar o recebimento_df recebido
+    coluna_contagem = rfid_col if rfid_col and rfid_col in recebimento_df.columns else 'sku'
+    
+    agrupamento = pd.DataFrame({
+        'HH:MM': faixa_horario(recebimento_df['timestamp'], minutos),
+        'Local': chave_local(recebimento_df),
+        'admin_username': recebimento_df['admin_username'],
+        'ID_Pallet': recebimento_df[coluna_contagem]
+    })
+    
+    return agrupamento.groupby(['HH:MM', 'Local', 'admin_username'], observed=True)['ID_Pallet'].count()
+
+def tabela_pallets_agrupados(contagens):
+    # Pivot horário/local x usuário das contagens, com a linha 'Total'
+    pivot = pd.pivot_table(
+        contagens.reset_index(),
+        index=['HH:MM', 'Local'],
+        columns=['admin_username'],
+        values='ID_Pallet',
+        aggfunc='sum',
+        fill_value=0,
+        observed=True
+    ).reset_index()
+    
+    return adicionar_total_pallets(pivot)
+
+def somas_armazenamento(faixa, rua, quantidade):
+    # Quantidade e pallets por faixa de horário e rua (RUA_NAO_RASTREADA para pallets sem posição)
+    # As somas são aditivas: o modo ao vivo acrescenta lotes novos e troca de rua os pallets movidos
+    chaves = [faixa.rename('faixa'), rua.astype(object).fillna(RUA_NAO_RASTREADA).rename('rua')]
+    return quantidade.groupby(chaves, sort=False).agg([('quantidade', 'sum'), ('pallets', 'size')])
+
+def tabela_armazenamento(somas, ruas):
+    # Tabela do relatório de armazenamento a partir das somas: minuto x rua, % não rastreado e linha TOTAL
+    somas = somas[somas['pallets'] > 0]
+    quantidade = somas['quantidade']
+    rua = quantidade.index.get_level_values('rua')
+    
+    qtd_conferida = quantidade.groupby(level='faixa', sort=True).sum()
+    nao_rastreado = (
+        quantidade[rua == RUA_NAO_RASTREADA].groupby(level='faixa').sum()
+        .reindex(qtd_conferida.index, fill_value=0)
+    )
+    
+    rastreado = quantidade[rua != RUA_NAO_RASTREADA]
+    por_rua = (
+        (rastreado.unstack('rua', fill_value=0) if len(rastreado) else pd.DataFrame(index=qtd_conferida.index))
+        .reindex(index=qtd_conferida.index, columns=ruas, fill_value=0)
+        .astype(quantidade.dtype)
+    )
+    
+    pct_nao_rastreado = pd.Series('0%', index=qtd_conferida.index)
+    com_quantidade = qtd_conferida > 0
+    pct_nao_rastreado[com_quantidade] = (
+        (nao_rastreado[com_quantidade] / qtd_conferida[com_quantidade] * 100).round(0).astype(int).astype(str) + '%'
+    )
+    
+    resultado_df = pd.concat([
+        pd.DataFrame({
+            'Faixa de Horário Recebido': qtd_conferida.index,
+            'Qtd Pallet Conferido': qtd_conferida.values,
+            'Não Rastreado': nao_rastreado.values,
+            '% Não Rastreado': pct_nao_rastreado.values
+        }),
+        por_rua.reset_index(drop=True)
+    ], axis=1)
+    
+    totais = {
+        'Faixa de Horário Recebido': 'TOTAL',
+        'Qtd Pallet Conferido': resultado_df['Qtd Pallet Conferido'].sum(),
+        'Não Rastreado': resultado_df['Não Rastreado'].sum(),
+    }
+    
+    if totais['Qtd Pallet Conferido'] > 0:
+        totais['% Não Rastreado'] = f"{int(round((totais['Não Rastreado'] / totais['Qtd Pallet Conferido'] * 100), 0))}%"
+    else:
+        totais['% Não Rastreado'] = '0%'
+    
+    for rua in ruas:
+        totais[rua] = resultado_df[rua].sum() if rua in resultado_df.columns else 0
+    
+    totais_df = pd.DataFrame([totais])
+    return pd.concat([resultado_df, totais_df], ignore_index=True)
+
+@medido('armazenamento')
+def armazenamento(recebimento_df, movimento_df, rfid_col_recebimento=None, rfid_col_movimento=None, timestamp_inicio=None, timestamp_fim=None, indice_posicoes=None):
+    # Relatório de armazenamento com opção de filtro por data/hora
+    # O período é recortado por busca binária no recebimento ordenado; horários sem fuso usam o fuso dos dados
+    if timestamp_inicio:
+        timestamp_inicio = alinhar_fuso(timestamp_inicio, recebimento_df['timestamp'])
+    if timestamp_fim:
+        timestamp_fim = alinhar_fuso(timestamp_fim, recebimento_df['timestamp'])
+    
+    recebimento_filtrado = recebimento_df
+    
+    if timestamp_inicio or timestamp_fim:
+        recebimento_filtrado = fatiar_periodo(recebimento_df, 'timestamp', timestamp_inicio, timestamp_fim)
+        
+        if recebimento_filtrado.empty:
+            return pd.DataFrame({'Mensagem': ['Não há dados no período selecionado']})
+    
+    has_rfid = (rfid_col_recebimento and rfid_col_recebimento in recebimento_filtrado.columns and 
+               rfid_col_movimento and rfid_col_movimento in movimento_df.columns)
+    
+    with medir_etapa("armazenamento: junção", len(recebimento_filtrado)) as medicao:
+        if has_rfid:
+            # Junção com a posição mais recente de cada tag: uma linha por pallet recebido
+            if indice_posicoes is None:
+                indice_posicoes = construir_indice_posicoes(movimento_df, rfid_col_movimento)
+            
+            merged = pd.merge(
+                recebimento_filtrado,
+                indice_posicoes[['name']],
+                left_on=rfid_col_recebimento,
+                right_index=True,
+                how='left'
+            )
+        else:
+            if 'name' not in movimento_df.columns or 'x' not in recebimento_filtrado.columns:
+                return pd.DataFrame({'Erro': ['Dados insuficientes para gerar relatório de armazenamento']})
+            
+            # Colunas convertidas em cópias locais: recebimento e movimento recebidos não são alterados
+            merged = pd.merge(
+                recebimento_filtrado.assign(x=recebimento_filtrado['x'].astype(str)),
+                movimento_df[['ground_position_alias', 'name']].assign(
+                    ground_position_alias=movimento_df['ground_position_alias'].astype(str)
+                ),
+                left_on='x',
+                right_on='ground_position_alias',
+                how='left'
+            )
+        medicao['linhas_saida'] = len(merged)
+    
+    merged['initial_quantity'] = pd.to_numeric(merged['initial_quantity'], errors='coerce').fillna(0)
+    
+    if merged['name'].isna().all() or len(merged['name'].dropna().unique()) == 0:
+        if has_rfid:
+            merged['name'] = merged[rfid_col_recebimento].apply(
+                lambda x: f"Rua {hash(x) % 5 + 1} {'Par' if hash(x) % 2 == 0 else 'Ímpar'}"
+            )
+        else:
+            merged['name'] = merged['x'].apply(
+                lambda x: f"Rua {hash(x) % 5 + 1} {'Par' if hash(x) % 2 == 0 else 'Ímpar'}"
+            )
+    
+    merged['Faixa de Horário Recebido'] = merged['timestamp'].dt.strftime('%H:%M')
+    
+    ruas = merged['name'].dropna().unique().tolist()
+    if len(ruas) == 0:
+        ruas = [f"Rua {i} {'Par' if i % 2 == 0 else 'Ímpar'}" for i in range(1, 6)]
+    
+    with medir_etapa("armazenamento: agregação por horário e rua", len(merged)) as medicao:
+        # Agregação única por minuto e rua em vez de filtrar 'merged' a cada horário
+        somas = somas_armazenamento(merged['Faixa de Horário Recebido'], merged['name'], merged['initial_quantity'])
+        resultado_df = tabela_armazenamento(somas, ruas)
+        medicao['linhas_saida'] = len(resultado_df)
+    
+    if has_rfid:
+        rastreados_rfid = len(merged[merged[rfid_col_recebimento].notna()])
+        total_registros = len(merged)
+        pct_rastreados = round((rastreados_rfid / total_registros * 100 if total_registros > 0 else 0), 1)
+        
+        info_df = pd.DataFrame([{
+            'Método de Junção': f"RFID ({rfid_col_recebimento} e {rfid_col_movimento})",
+            'Pallets Rastreados por RFID': rastreados_rfid,
+            'Total de Pallets': total_registros,
+            '% Rastreados por RFID': f"{pct_rastreados}%"
+        }])
+        
+        if timestamp_inicio or timestamp_fim:
+            periodo = ""
+            if timestamp_inicio:
+                periodo += f"De: {timestamp_inicio.strftime('%Y-%m-%d %H:%M:%S')}"
+            if timestamp_fim:
+                periodo += f" Até: {timestamp_fim.strftime('%Y-%m-%d %H:%M:%S')}"
+            
+            info_df['Período Filtrado'] = periodo
+        
+        return {
+            'resultado': resultado_df,
+            'info_rastreabilidade': info_df
+        }
+    
+    if timestamp_inicio or timestamp_fim:
+        resultado_info = {
+            'Período Filtrado': "",
+        }
+        
+        if timestamp_inicio:
+            resultado_info['Período Filtrado'] += f"De: {timestamp_inicio.strftime('%Y-%m-%d %H:%M:%S')}"
+        if timestamp_fim:
+            resultado_info['Período Filtrado'] += f" Até: {timestamp_fim.strftime('%Y-%m-%d %H:%M:%S')}"
+        
+        info_df = pd.DataFrame([resultado_info])
+        
+        return {
+            'resultado': resultado_df,
+            'info_rastreabilidade': info_df
+        }
+    
+    return resultado_df
+
+def normalizar_rotulos(serie):
+    # Rótulos sem diferença de caixa/espaços ('Nivel A' e 'NIVEL A'); em categóricas, o trabalho é só sobre as categorias
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.astype(str).str.strip().str.upper().where(serie.notna())
+    
+    codigos_normalizados, rotulos = pd.factorize(serie.cat.categories.astype(str).str.strip().str.upper())
+    codigos = serie.cat.codes.to_numpy()
+    codigos = np.where(codigos >= 0, codigos_normalizados[codigos], -1)
+    
+    return pd.Series(pd.Categorical.from_codes(codigos, rotulos), index=serie.index, name=serie.name)
+
+@medido('analise_movimentos')
+def analise_movimentos(movimento_df, recebimento_df, rfid_col_movimento, rfid_col_recebimento=None):
+    # Caminho dos pallets no armazém: tempo do recebimento ao primeiro STOCK, permanência por rua/nível
+    # e movimentos por pallet, com operações agrupadas sobre os movimentos ordenados (sem laço por tag)
+    colunas = [col for col in [rfid_col_movimento, 'moved_at', 'type', 'name', 'ground_position_group_level_name']
+               if col in movimento_df.columns]
+    movimentos = ordenar_por_tempo(
+        movimento_df.loc[movimento_df[rfid_col_movimento].notna() & movimento_df['moved_at'].notna(), colunas],
+        'moved_at'
+    )
+    
+    # Códigos inteiros por tag e ordenação estável: cada pallet fica contíguo e em ordem de 'moved_at'
+    codigos, tags = pd.factorize(movimentos[rfid_col_movimento].astype(str))
+    ordem = np.argsort(codigos, kind='stable')
+    movimentos = movimentos.iloc[ordem].reset_index(drop=True)
+    movimentos['pallet'] = codigos[ordem]
+    
+    # Permanência = intervalo até o próximo movimento do mesmo pallet (a posição atual fica em aberto)
+    proximo = movimentos.groupby('pallet', sort=False)['moved_at'].shift(-1)
+    movimentos['permanencia_min'] = (proximo - movimentos['moved_at']).dt.total_seconds() / 60
+    
+    # Recebimento de cada pallet: primeiro 'timestamp' da tag no recebimento
+    recebido_em = pd.Series(pd.NaT, index=tags, dtype=movimentos['moved_at'].dtype)
+    if rfid_col_recebimento and rfid_col_recebimento in recebimento_df.columns:
+        recebidos = recebimento_df[recebimento_df[rfid_col_recebimento].notna()]
+        primeiro_recebimento = recebidos['timestamp'].groupby(recebidos[rfid_col_recebimento].astype(str)).min()
+        recebido_em = primeiro_recebimento.reindex(tags).astype(movimentos['moved_at'].dtype)
+    
+    # Primeiro STOCK depois do recebimento (ou o primeiro STOCK, se o pallet não aparece no recebimento)
+    # Os timestamps com fuso ficam como arrays do pandas: to_numpy() criaria um objeto Python por linha
+    recebido_movimento = recebido_em.array.take(movimentos['pallet'].to_numpy())
+    stock = movimentos[
+        (movimentos['type'] == 'STOCK').to_numpy() &
+        ((movimentos['moved_at'].array >= recebido_movimento) | recebido_movimento.isna())
+    ].drop_duplicates('pallet', keep='first').set_index('pallet')
+    
+    pallets = pd.DataFrame({
+        'Tag RFID': tags,
+        'Movimentos': np.bincount(movimentos['pallet'], minlength=len(tags)),
+        'Recebido em': recebido_em.array,
+        'Primeiro STOCK': stock['moved_at'].reindex(range(len(tags))).array,
+        'Rua do Primeiro STOCK': stock['name'].reindex(range(len(tags))).array if 'name' in stock.columns else None
+    })
+    pallets['Minutos até STOCK'] = ((pallets['Primeiro STOCK'] - pallets['Recebido em']).dt.total_seconds() / 60).round(1)
+    
+    com_tempo = pallets[pallets['Minutos até STOCK'].notna()]
+    armazenagem_por_rua = (
+        com_tempo.groupby('Rua do Primeiro STOCK', observed=True)['Minutos até STOCK']
+        .agg([('Pallets', 'count'), ('Mediana (min)', 'median'), ('Média (min)', 'mean'), ('Máximo (min)', 'max')])
+        .round(1)
+        .sort_values('Mediana (min)', ascending=False)
+        .reset_index()
+        .rename(columns={'Rua do Primeiro STOCK': 'Rua'})
+    )
+    
+    # Soma, contagem e máximo são agregados por rótulo original e depois combinados nos rótulos normalizados
+    permanencia_rua_nivel = pd.DataFrame(columns=['Rua', 'Nível', 'Permanências', 'Média (min)', 'Máximo (min)', 'Total (h)'])
+    if {'name', 'ground_position_group_level_name'} <= set(movimentos.columns):
+        estadias = movimentos[movimentos['permanencia_min'].notna()]
+        permanencia = (
+            estadias['permanencia_min']
+            .groupby([estadias['name'], normalizar_rotulos(estadias['ground_position_group_level_name'])], observed=True)
+            .agg(['count', 'sum', 'max'])
+        )
+        permanencia_rua_nivel = pd.DataFrame({
+            'Permanências': permanencia['count'],
+            'Média (min)': (permanencia['sum'] / permanencia['count']).round(1),
+            'Máximo (min)': permanencia['max'].round(1),
+            'Total (h)': (permanencia['sum'] / 60).round(1)
+        }).rename_axis(['Rua', 'Nível']).reset_index().sort_values('Média (min)', ascending=False, ignore_index=True)
+    
+    distribuicao_movimentos = (
+        pallets['Movimentos'].value_counts().sort_index()
+        .rename_axis('Movimentos por Pallet').reset_index(name='Pallets')
+    )
+    
+    return {
+        'pallets': pallets.sort_values('Minutos até STOCK', ascending=False, na_position='last', ignore_index=True),
+        'armazenagem_por_rua': armazenagem_por_rua,
+        'permanencia_rua_nivel': permanencia_rua_nivel,
+        'distribuicao_movimentos': distribuicao_movimentos
+    }
+
+def detectar_codificacao(caminho, tamanho_amostra=None, conteudo=None, tamanho_bloco=1 << 20):
+    # Confere em blocos se o arquivo (ou 'conteudo') é UTF-8 válido; caso contrário usa latin1
+    # Com 'tamanho_amostra' só o início é conferido; o leitor pyarrow refaz a leitura em latin1 se o resto falhar
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    with (io.BytesIO(conteudo) if conteudo is not None else open(caminho, 'rb')) as arquivo:
+        try:
+            if tamanho_amostra is not None:
+                # Caractere multibyte cortado no fim da amostra não é erro
+                decodificador.decode(arquivo.read(tamanho_amostra))
+                return 'utf-8'
+            for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+                decodificador.decode(bloco)
+            decodificador.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return 'latin1'
+    return 'utf-8'
+
+def ler_csv_em_blocos(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    # Percorre o CSV em blocos de até 'tamanho_bloco' linhas, já normalizados
+    # Colunas de texto são fixadas como str para que um bloco só com SKUs numéricos não mude o tipo
+    # As linhas puladas de cada bloco ficam em attrs['linhas_descartadas'], como em ler_csv
+    codificacao = detectar_codificacao(caminho)
+    esquema = esquema_do_arquivo(caminho)
+    with pd.read_csv(caminho, sep=';', encoding=codificacao, on_bad_lines='warn', chunksize=tamanho_bloco,
+                     dtype={col: str for col in COLUNAS_TEXTO}) as leitor:
+        while True:
+            # Os avisos são capturados só durante a leitura do bloco, não enquanto quem consome o processa
+            with warnings.catch_warnings(record=True) as avisos:
+                warnings.simplefilter('always', pd.errors.ParserWarning)
+                bloco = next(leitor, None)
+            if bloco is None:
+                return
+            
+            bloco = normalizar_csv(bloco, esquema)
+            bloco.attrs['linhas_descartadas'] = contar_linhas_puladas(avisos)
+            yield bloco
+
+def indice_posicoes_em_blocos(caminhos_movimento=(CAMINHO_MOVIMENTO,), rfid_col='tag_rfid', tamanho_bloco=TAMANHO_BLOCO):
+    # Índice de última posição por tag construído bloco a bloco sobre o histórico de movimentos (uma ou mais exportações)
+    # Devolve também a última rua vista por alias, que resolve as ruas do export de última posição
+    # As linhas puladas na leitura ficam em attrs['linhas_descartadas'] do índice
+    indice = ruas_por_alias = None
+    descartadas = 0
+    for caminho in caminhos_movimento:
+        for bloco in ler_csv_em_blocos(caminho, tamanho_bloco):
+            descartadas += bloco.attrs['linhas_descartadas']
+            parcial = construir_indice_posicoes(bloco, rfid_col)
+            indice = parcial if indice is None else atualizar_indice_posicoes(indice, parcial)
+            
+            if {'ground_position_alias', 'name'} <= set(bloco.columns):
+                aliases = bloco.dropna(subset=['name'])[['ground_position_alias', 'name']].astype(str)
+                if ruas_por_alias is not None:
+                    aliases = pd.concat([ruas_por_alias, aliases])
+                ruas_por_alias = aliases.drop_duplicates('ground_position_alias', keep='last')
+    indice.attrs['linhas_descartadas'] = descartadas
+    return indice, ruas_por_alias
+
+def gerar_relatorios(dados):
+    # Calcula todos os relatórios do painel sobre os dados carregados (sem depender do Streamlit)
+    saldo_edicoes = dados.get('saldo_edicoes')
+    rfid_col = dados.get('rfid_col_recebimento')
+    relatorios = {
+        'codigos_quantidades': codigos_quantidades(dados['recebimento'], saldo_edicoes),
+        'total_pallets_por_sku': total_pallets_por_sku(dados['recebimento'], saldo_edicoes, rfid_col)
+    }
+    if saldo_edicoes is not None and rfid_col:
+        relatorios['quantidades_por_pallet'] = quantidades_por_pallet(dados['recebimento'], rfid_col, saldo_edicoes)
+    
+    for minutos in INTERVALOS_PALLETS:
+        relatorios[f'pallets_agrupados_{minutos}min'] = pallets_agrupados(
+            dados['recebimento'], dados.get('rfid_col_recebimento'), minutos
+        )
+    
+    resultado_armazenamento = armazenamento(
+        dados['recebimento'],
+        dados['movimento'],
+        dados.get('rfid_col_recebimento'),
+        dados.get('rfid_col_movimento'),
+        indice_posicoes=dados.get('indice_posicoes')
+    )
+    if isinstance(resultado_armazenamento, dict):
+        relatorios['armazenamento'] = resultado_armazenamento['resultado']
+        relatorios['armazenamento_info'] = resultado_armazenamento['info_rastreabilidade']
+    else:
+        relatorios['armazenamento'] = resultado_armazenamento
+    
+    # A análise de movimentação precisa do histórico completo, que o modo em blocos não mantém
+    if dados.get('rfid_col_movimento') and not dados.get('movimento_em_blocos'):
+        analise = analise_movimentos(
+            dados['movimento'], dados['recebimento'], dados['rfid_col_movimento'], rfid_col
+        )
+        for nome, df in analise.items():
+            relatorios[f'movimentacao_{nome}'] = df
+    
+    grade = grade_ocupacao(dados)
+    if grade is not None:
+        relatorios['ocupacao'] = mapa_ocupacao(grade)
+    
+    return relatorios
+
+def versao_manifesto(versao):
+    # Versão comparável entre máquinas: nome do arquivo, tamanho e mtime
+    return [[os.path.basename(caminho), tamanho, mtime] for caminho, tamanho, mtime in versao]
+
+def gravar_relatorios(relatorios, destino, versao, ultima_posicao=False):
+    # Grava cada relatório em Parquet e um manifesto JSON com a versão dos dados de origem
+    # 'ultima_posicao' registra se o índice de posições foi semeado pelo export de última posição
+    os.makedirs(destino, exist_ok=True)
+    
+    manifesto = {
+        'gerado_em': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'versao': versao_manifesto(versao),
+        'ultima_posicao': bool(ultima_posicao),
+        'relatorios': {}
+    }
+    
+    for nome, df in relatorios.items():
+        arquivo = f'{nome}.parquet'
+        tabela = df.copy()
+        tabela.columns = [str(col) for col in df.columns]
+        tabela.to_parquet(os.path.join(destino, arquivo), index=False)
+        
+        manifesto['relatorios'][nome] = {'arquivo': arquivo, 'linhas': len(tabela), 'colunas': list(tabela.columns)}
+    
+    # Manifesto gravado por último e de forma atômica: só é lido depois que todos os relatórios existem
+    caminho_manifesto = os.path.join(destino, 'manifesto.json')
+    with open(caminho_manifesto + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+    os.replace(caminho_manifesto + '.tmp', caminho_manifesto)
+    
+    return manifesto
+
+def ler_relatorios_precalculados(destino, versao, ultima_posicao=False):
+    # Relatórios do modo batch, apenas se o manifesto corresponder à versão atual dos dados e às mesmas opções
+    # (manifestos sem a opção 'ultima_posicao' são de antes dela e também são recusados)
+    caminho_manifesto = os.path.join(destino, 'manifesto.json')
+    if pq is None or not os.path.exists(caminho_manifesto):
+        return None
+    
+    try:
+        with open(caminho_manifesto, encoding='utf-8') as arquivo:
+            manifesto = json.load(arquivo)
+        if manifesto.get('versao') != versao_manifesto(versao) or manifesto.get('ultima_posicao') != bool(ultima_posicao):
+            return None
+        
+        return {
+            nome: pd.read_parquet(os.path.join(destino, info['arquivo']))
+            for nome, info in manifesto['relatorios'].items()
+        }
+    except Exception:
+        return None
@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+from datetime import date
+
+import processamento
+
+def executar(diretorio_dados, destino, usar_ultima_posicao=False, tamanho_bloco=None, data_inicio=None, data_fim=None):
+    # Carrega os CSVs de 'diretorio_dados', calcula todos os relatórios e grava Parquet + manifesto em 'destino'
+    # Com 'tamanho_bloco' os movimentos são lidos em blocos (memória limitada, sem os relatórios de movimentação)
+    # 'data_inicio'/'data_fim' restringem as exportações diárias lidas (e a versão gravada no manifesto)
+    caminho_ultima_posicao = os.path.join(diretorio_dados, processamento.ARQUIVO_ULTIMA_POSICAO) if usar_ultima_posicao else None
+    
+    versao = processamento.versao_dados(diretorio_dados, data_inicio, data_fim)
+    dados = processamento.carregar_dados(caminho_ultima_posicao, diretorio=diretorio_dados, data_inicio=data_inicio,
+                                         data_fim=data_fim, tamanho_bloco=tamanho_bloco)
+    relatorios = processamento.gerar_relatorios(dados)
+    
+    return processamento.gravar_relatorios(relatorios, destino, versao, usar_ultima_posicao)
+
+def main():
+    # Linha de comando do modo batch (sem interface), para execução agendada
+    parser = argparse.ArgumentParser(description="Gera todos os relatórios do painel RFID sem a interface Streamlit.")
+    parser.add_argument('--dados', default=processamento.DIRETORIO_DADOS, help="Diretório com os CSVs exportados")
+    parser.add_argument('--destino', default=processamento.DIRETORIO_RELATORIOS, help="Diretório de saída dos relatórios")
+    parser.add_argument('--ultima-posicao', action='store_true',
+                        help="Usa 'Teste last position.csv' para semear o índice de posições RFID")
+    parser.add_argument('--tamanho-bloco', type=int, default=None, metavar='LINHAS',
+                        help="Lê os movimentos em blocos de LINHAS linhas, sem carregá-los inteiros "
+                             "(não gera os relatórios de movimentação)")
+    parser.add_argument('--inicio', type=date.fromisoformat, default=None, metavar='AAAA-MM-DD',
+                        help="Primeira data das exportações diárias a ler (inclusive)")
+    parser.add_argument('--fim', type=date.fromisoformat, default=None, metavar='AAAA-MM-DD',
+                        help="Última data das exportações diárias a ler (inclusive)")
+    args = parser.parse_args()
+    
+    warnings.filterwarnings('ignore')
+    inicio = time.perf_counter()
+    try:
+        manifesto = executar(args.dados, args.destino, args.ultima_posicao, args.tamanho_bloco, args.inicio, args.fim)
+    except Exception as e:
+        print(f"Erro ao gerar relatórios: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    for nome, info in manifesto['relatorios'].items():
+        print(f"{nome:<38} {info['linhas']:>8} linhas  {os.path.join(args.destino, info['arquivo'])}")
+    print(f"Concluído em {time.perf_counter() - inicio:.2f}s")
+
+if __name__ == "__main__":
+    main()
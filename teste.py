@@ -1,285 +1,546 @@
 import pandas as pd
-import numpy as np
 import os
+import threading
+import tracemalloc
+import weakref
+from datetime import datetime
 import streamlit as st
+import altair as alt
 
-def carregar_dados():
-    # Função para carregar e processar os arquivos CSV
-    try:
-        caminho_movimento = 'Arquivos/Teste Movement.csv'
-        caminho_recebimento = 'Arquivos/Teste recebimento.csv'
-        
-        try:
-            movimento_df = pd.read_csv(caminho_movimento, sep=';', encoding='utf-8', on_bad_lines='skip')
-            recebimento_df = pd.read_csv(caminho_recebimento, sep=';', encoding='utf-8', on_bad_lines='skip')
-        except:
-            movimento_df = pd.read_csv(caminho_movimento, sep=';', encoding='latin1', on_bad_lines='skip')
-            recebimento_df = pd.read_csv(caminho_recebimento, sep=';', encoding='latin1', on_bad_lines='skip')
-        
-        if len(movimento_df.columns) == 1 and ';' in movimento_df.columns[0]:
-            movimento_df = pd.DataFrame([x.split(';') for x in movimento_df[movimento_df.columns[0]].tolist()], 
-                                      columns=movimento_df.columns[0].split(';'))
-        
-        if len(recebimento_df.columns) == 1 and ';' in recebimento_df.columns[0]:
-            recebimento_df = pd.DataFrame([x.split(';') for x in recebimento_df[recebimento_df.columns[0]].tolist()], 
-                                         columns=recebimento_df.columns[0].split(';'))
-        
-        movimento_df.columns = movimento_df.columns.str.strip('" ')
-        recebimento_df.columns = recebimento_df.columns.str.strip('" ')
-        
-        rfid_col_movimento = [col for col in movimento_df.columns if 'rfid' in col.lower()]
-        rfid_col_recebimento = [col for col in recebimento_df.columns if 'rfid' in col.lower()]
-        
-        if rfid_col_movimento and rfid_col_recebimento:
-            for col in rfid_col_movimento:
-                movimento_df[col] = movimento_df[col].astype(str)
-            for col in rfid_col_recebimento:
-                recebimento_df[col] = recebimento_df[col].astype(str)
-        
-        if 'timestamp' in recebimento_df.columns:
-            recebimento_df['timestamp'] = pd.to_datetime(recebimento_df['timestamp'], errors='coerce')
-        
-        for col in ['x', 'y', 'z']:
-            if col in recebimento_df.columns:
-                recebimento_df[col] = recebimento_df[col].fillna('0')
-        
-        if 'initial_quantity' in recebimento_df.columns:
-            recebimento_df['initial_quantity'] = pd.to_numeric(recebimento_df['initial_quantity'], errors='coerce').fillna(0)
-            
-        return {
-            'movimento': movimento_df,
-            'recebimento': recebimento_df,
-            'rfid_col_movimento': rfid_col_movimento[0] if rfid_col_movimento else None,
-            'rfid_col_recebimento': rfid_col_recebimento[0] if rfid_col_recebimento else None
-        }
-    except Exception as e:
-        st.error(f"Erro ao carregar dados: {e}")
-        return None
+# Leitura, ingestão e relatórios ficam em processamento.py, sem Streamlit, compartilhado com o modo batch
+from processamento import (
+    ARQUIVO_EDICAO, ARQUIVO_LOG_DESEMPENHO, DIRETORIO_RELATORIOS, INTERVALOS_PALLETS,
+    analise_movimentos, armazenamento, carregar_dados, codigos_quantidades, faixas_z_ocupadas, grade_ocupacao,
+    gravar_medicoes, impressao_digital_arquivos, iniciar_medicoes, ler_relatorios_precalculados, limites_periodo,
+    mapa_ocupacao, medir_etapa, pallets_agrupados, quantidades_por_pallet, reiniciar_ingestao,
+    tabela_armazenamento, tabela_pallets_agrupados, total_pallets_por_sku, versao_dados
+)
 
-def codigos_quantidades(recebimento_df):
-    # Relatório de códigos e quantidades recebidas
-    resultado = recebimento_df.groupby('sku')['initial_quantity'].sum().reset_index()
-    resultado.columns = ['Código do Item', 'Qtd no Quantum']
-    
-    resultado = resultado.sort_values('Código do Item')
-    
-    return resultado
+MAX_VERSOES_CACHE = 4
+MAX_PERIODOS_CACHE = 16
+INGESTAO_INCREMENTAL = True
+INTERVALOS_AO_VIVO = [5, 10, 30, 60]
+LIMITE_LINHAS_TABELA = 500
 
-def total_pallets_por_sku(recebimento_df):
-    # Relatório de estatísticas de pallets por SKU
-    stats = recebimento_df.groupby('sku')['initial_quantity'].agg([
-        ('Total de Pallets', 'count'),
-        ('Média por Pallet', 'mean'),
-        ('Mínimo por Pallet', 'min'),
-        ('Máximo por Pallet', 'max')
-    ]).reset_index()
-    
-    stats.rename(columns={'sku': 'Código do Item'}, inplace=True)
-    
-    stats['Média por Pallet'] = stats['Média por Pallet'].round(2)
-    
-    stats = stats.sort_values('Código do Item')
-    
-    return stats
+@st.cache_data(max_entries=MAX_VERSOES_CACHE, show_spinner=False)
+def carregar_dados_em_cache(impressao_digital, incremental=INGESTAO_INCREMENTAL):
+    # Reaproveita os DataFrames já processados enquanto os arquivos não mudarem
+    return carregar_dados(incremental=incremental)
 
-def pallets_agrupados(recebimento_df, rfid_col=None):
-    # Relatório de pallets agrupados por horário e usuário
-    recebimento_df['Local'] = recebimento_df['x'].apply(lambda x: str(x).split('.')[0] if pd.notna(x) else '0') + ',' + \
-                           recebimento_df['y'].apply(lambda y: str(y).split('.')[0] if pd.notna(y) else '0') + ',' + \
-                           recebimento_df['z'].apply(lambda z: str(z).split('.')[0] if pd.notna(z) else '0')
-    
-    recebimento_df['HH:MM'] = recebimento_df['timestamp'].dt.strftime('%H:%M')
-    
-    if rfid_col and rfid_col in recebimento_df.columns:
-        recebimento_df['ID_Pallet'] = recebimento_df[rfid_col]
+@st.cache_resource(max_entries=1, show_spinner=False)
+def carregar_dados_ao_vivo(impressao_digital):
+    # Modo ao vivo: só a versão mais recente, compartilhada entre as sessões e sem cópia a cada atualização
+    # (o cache_data desserializaria todos os DataFrames a cada intervalo); nada aqui é alterado pelos relatórios
+    return carregar_dados(incremental=True, ao_vivo=True)
+
+class PedidoMedicaoMemoria:
+    # Marca guardada no session_state da sessão que pediu o pico de memória; some com a sessão descartada
+    pass
+
+@st.cache_resource(show_spinner=False)
+def pedidos_medicao_memoria():
+    # Pedidos de todas as sessões (conjunto fraco: sessões encerradas saem sozinhas) e a trava que os protege
+    return weakref.WeakSet(), threading.Lock()
+
+def ajustar_tracemalloc(medir):
+    # O tracemalloc vale para o servidor inteiro: fica ligado enquanto alguma sessão pedir o pico de memória
+    # e só é desligado quando nenhuma pede mais (uma sessão não o desliga no meio da medição de outra)
+    pedidos, trava = pedidos_medicao_memoria()
+    pedido = st.session_state.setdefault('pedido_medicao_memoria', PedidoMedicaoMemoria())
+    with trava:
+        if medir:
+            pedidos.add(pedido)
+        else:
+            pedidos.discard(pedido)
         
-        pivot = pd.pivot_table(
-            recebimento_df,
-            index=['HH:MM', 'Local'],
-            columns=['admin_username'],
-            values='ID_Pallet',
-            aggfunc='count',
-            fill_value=0
-        ).reset_index()
-    else:
-        pivot = pd.pivot_table(
-            recebimento_df,
-            index=['HH:MM', 'Local'],
-            columns=['admin_username'],
-            values='sku',
-            aggfunc='count',
-            fill_value=0
-        ).reset_index()
-    
-    totais = pivot.sum(numeric_only=True)
-    totais_row = pd.DataFrame([['Total', ''] + totais.tolist()], 
-                            columns=pivot.columns)
-    
-    resultado = pd.concat([pivot, totais_row], ignore_index=True)
-    
-    return resultado
+        if len(pedidos) and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not len(pedidos) and tracemalloc.is_tracing():
+            tracemalloc.stop()
 
-def armazenamento(recebimento_df, movimento_df, rfid_col_recebimento=None, rfid_col_movimento=None, timestamp_inicio=None, timestamp_fim=None):
-    # Relatório de armazenamento com opção de filtro por data/hora
-    if timestamp_inicio:
-        timestamp_inicio = pd.to_datetime(timestamp_inicio)
-    if timestamp_fim:
-        timestamp_fim = pd.to_datetime(timestamp_fim)
-    
-    recebimento_filtrado = recebimento_df.copy()
-    
-    if timestamp_inicio or timestamp_fim:
-        recebimento_filtrado['timestamp'] = pd.to_datetime(recebimento_filtrado['timestamp'])
+@st.cache_data(max_entries=MAX_VERSOES_CACHE, show_spinner=False)
+def codigos_quantidades_em_cache(versao, _recebimento_df, _saldo_edicoes=None):
+    # Relatório memoizado por versão dos dados (parâmetros com '_' não entram no hash do cache)
+    return codigos_quantidades(_recebimento_df, _saldo_edicoes)
+
+@st.cache_data(max_entries=MAX_VERSOES_CACHE, show_spinner=False)
+def total_pallets_por_sku_em_cache(versao, _recebimento_df, _saldo_edicoes=None, rfid_col=None):
+    # Estatísticas por SKU memoizadas por versão dos dados
+    return total_pallets_por_sku(_recebimento_df, _saldo_edicoes, rfid_col)
+
+@st.cache_data(max_entries=MAX_VERSOES_CACHE, show_spinner=False)
+def quantidades_por_pallet_em_cache(versao, _recebimento_df, rfid_col, _saldo_edicoes):
+    # Quantidade líquida por pallet memoizada por versão dos dados (a versão inclui o razão de edições)
+    return quantidades_por_pallet(_recebimento_df, rfid_col, _saldo_edicoes)
+
+@st.cache_data(max_entries=MAX_VERSOES_CACHE * len(INTERVALOS_PALLETS), show_spinner=False)
+def pallets_agrupados_em_cache(versao, _recebimento_df, rfid_col, minutos):
+    # Pallets agrupados memoizados por versão dos dados e intervalo de minutos
+    return pallets_agrupados(_recebimento_df, rfid_col, minutos)
+
+@st.cache_data(max_entries=MAX_VERSOES_CACHE * MAX_PERIODOS_CACHE, show_spinner=False)
+def armazenamento_em_cache(versao, _dados, timestamp_inicio=None, timestamp_fim=None):
+    # Relatório de armazenamento memoizado por versão dos dados e período filtrado
+    return armazenamento(
+        _dados['recebimento'],
+        _dados['movimento'],
+        _dados.get('rfid_col_recebimento'),
+        _dados.get('rfid_col_movimento'),
+        timestamp_inicio,
+        timestamp_fim,
+        indice_posicoes=_dados.get('indice_posicoes')
+    )
+
+@st.cache_data(max_entries=MAX_VERSOES_CACHE, show_spinner=False)
+def analise_movimentos_em_cache(versao, _dados):
+    # Análise de movimentação memoizada por versão dos dados
+    return analise_movimentos(
+        _dados['movimento'],
+        _dados['recebimento'],
+        _dados['rfid_col_movimento'],
+        _dados.get('rfid_col_recebimento')
+    )
+
+@st.cache_data(max_entries=MAX_VERSOES_CACHE, show_spinner=False)
+def relatorios_precalculados_em_cache(versao, assinatura_manifesto):
+    # Relatórios pré-calculados memoizados por versão dos dados e do manifesto
+    # A interface não semeia o índice com a última posição: só serve um batch gerado sem '--ultima-posicao'
+    return ler_relatorios_precalculados(DIRETORIO_RELATORIOS, versao, ultima_posicao=False)
+
+@st.cache_data(max_entries=MAX_VERSOES_CACHE, show_spinner=False)
+def grade_ocupacao_em_cache(versao, _dados):
+    # Grade de ocupação memoizada por versão dos dados, construída só quando a página a pede
+    # A tabela por tag ('tags') só serve à atualização incremental e fica fora do cache
+    grade = grade_ocupacao(_dados)
+    return None if grade is None else {chave: valor for chave, valor in grade.items() if chave != 'tags'}
+
+def limpar_cache_relatorios():
+    # Descarta os relatórios memoizados de todas as versões
+    codigos_quantidades_em_cache.clear()
+    total_pallets_por_sku_em_cache.clear()
+    quantidades_por_pallet_em_cache.clear()
+    pallets_agrupados_em_cache.clear()
+    armazenamento_em_cache.clear()
+    analise_movimentos_em_cache.clear()
+    grade_ocupacao_em_cache.clear()
+    relatorios_precalculados_em_cache.clear()
+
+def exibir_tabela(etapa, df, **opcoes):
+    # st.dataframe medido como etapa (serialização e envio da tabela ao navegador)
+    with medir_etapa(f"exibição: {etapa}", len(df)) as medicao:
+        st.dataframe(df, **opcoes)
+        medicao['linhas_saida'] = len(df)
+
+def filtro_periodo(recebimento_df):
+    # Filtro de data/hora do recebimento; retorna (início, fim) sem fuso ou (None, None) se desligado
+    # O período escolhido fica em 'periodo_armazenado' na sessão e volta preenchido nas próximas execuções,
+    # inclusive depois de visitar outras páginas (o Streamlit descarta o estado de widgets não exibidos)
+    primeiro, ultimo = limites_periodo(recebimento_df, 'timestamp')
+    
+    with st.expander("Filtrar por período"):
+        if primeiro is None:
+            st.caption("Sem horários válidos no recebimento.")
+            return None, None
         
-        if timestamp_inicio:
-            recebimento_filtrado = recebimento_filtrado[recebimento_filtrado['timestamp'] >= timestamp_inicio]
-        if timestamp_fim:
-            recebimento_filtrado = recebimento_filtrado[recebimento_filtrado['timestamp'] <= timestamp_fim]
+        salvo = st.session_state.get('periodo_armazenado', {})
+        limitar = lambda dia: min(max(dia, primeiro.date()), ultimo.date())
         
-        if recebimento_filtrado.empty:
-            return pd.DataFrame({'Mensagem': ['Não há dados no período selecionado']})
-    
-    has_rfid = (rfid_col_recebimento and rfid_col_recebimento in recebimento_filtrado.columns and 
-               rfid_col_movimento and rfid_col_movimento in movimento_df.columns)
-    
-    recebimento_filtrado['initial_quantity'] = pd.to_numeric(recebimento_filtrado['initial_quantity'], errors='coerce').fillna(0)
+        filtrar = st.checkbox("Aplicar filtro de data/hora", value=salvo.get('filtrar', False), key='armazenado_filtrar')
+        col_inicio, col_fim = st.columns(2)
+        with col_inicio:
+            data_inicio = st.date_input("Data inicial", value=limitar(salvo.get('data_inicio', primeiro.date())),
+                                        min_value=primeiro.date(), max_value=ultimo.date(), key='armazenado_data_inicio')
+            hora_inicio = st.time_input("Hora inicial", value=salvo.get('hora_inicio', datetime.min.time()),
+                                        key='armazenado_hora_inicio')
+        with col_fim:
+            data_fim = st.date_input("Data final", value=limitar(salvo.get('data_fim', ultimo.date())),
+                                     min_value=primeiro.date(), max_value=ultimo.date(), key='armazenado_data_fim')
+            hora_fim = st.time_input("Hora final", value=salvo.get('hora_fim', datetime.max.time().replace(second=0, microsecond=0)),
+                                     key='armazenado_hora_fim')
+    
+    st.session_state['periodo_armazenado'] = {
+        'filtrar': filtrar,
+        'data_inicio': data_inicio,
+        'hora_inicio': hora_inicio,
+        'data_fim': data_fim,
+        'hora_fim': hora_fim
+    }
     
-    if has_rfid:
-        merged = pd.merge(
-            recebimento_filtrado,
-            movimento_df[['name', rfid_col_movimento]],
-            left_on=rfid_col_recebimento,
-            right_on=rfid_col_movimento,
-            how='left'
-        )
-    else:
-        if 'name' not in movimento_df.columns or 'x' not in recebimento_filtrado.columns:
-            return pd.DataFrame({'Erro': ['Dados insuficientes para gerar relatório de armazenamento']})
-        
-        recebimento_filtrado['x'] = recebimento_filtrado['x'].astype(str)
-        movimento_df['ground_position_alias'] = movimento_df['ground_position_alias'].astype(str)
-        
-        merged = pd.merge(
-            recebimento_filtrado,
-            movimento_df[['ground_position_alias', 'name']],
-            left_on='x',
-            right_on='ground_position_alias',
-            how='left'
-        )
+    if not filtrar:
+        return None, None
     
-    if merged['name'].isna().all() or len(merged['name'].dropna().unique()) == 0:
-        if has_rfid:
-            merged['name'] = merged[rfid_col_recebimento].apply(
-                lambda x: f"Rua {hash(x) % 5 + 1} {'Par' if hash(x) % 2 == 0 else 'Ímpar'}"
+    # A hora final inclui o minuto inteiro (até HH:MM:59.999999)
+    inicio = pd.Timestamp(datetime.combine(data_inicio, hora_inicio))
+    fim = pd.Timestamp(datetime.combine(data_fim, hora_fim)) + pd.Timedelta(minutes=1) - pd.Timedelta(microseconds=1)
+    return inicio, fim
+
+def exibir_medicoes(registros):
+    # Painel lateral com as etapas desta execução; as opções valem a partir da próxima execução
+    with st.sidebar:
+        with st.expander("Desempenho desta execução"):
+            st.checkbox(
+                "Medir pico de memória (tracemalloc, mais lento)",
+                key='medir_memoria',
+                help="O tracemalloc é do servidor: enquanto alguma sessão o pedir, todas as sessões rodam mais lentas"
             )
-        else:
-            merged['name'] = merged['x'].apply(
-                lambda x: f"Rua {hash(x) % 5 + 1} {'Par' if hash(x) % 2 == 0 else 'Ímpar'}"
+            st.checkbox(f"Gravar medições em '{ARQUIVO_LOG_DESEMPENHO}'", key='gravar_medicoes')
+            
+            if not registros:
+                st.caption("Nenhuma etapa executada: dados e relatórios vieram do cache.")
+                return
+            
+            tabela = pd.DataFrame(registros)
+            st.dataframe(
+                pd.DataFrame({
+                    'Etapa': ['· ' * nivel + etapa for nivel, etapa in zip(tabela['nivel'], tabela['etapa'])],
+                    'Tempo (s)': tabela['segundos'].round(3),
+                    'Linhas entrada': tabela['linhas_entrada'].astype('Int64'),
+                    'Linhas saída': tabela['linhas_saida'].astype('Int64'),
+                    'Pico (MB)': tabela['pico_mb']
+                }),
+                hide_index=True
             )
+            st.caption("Etapas reaproveitadas do cache não aparecem.")
+
+def formatar_titulo(texto):
+    # Formatação de título para Streamlit
+    return texto
+
+def exibir_pagina_ao_vivo(pagina):
+    # Trecho refeito a cada intervalo do modo ao vivo: lê só as linhas novas de 'Arquivos/' e redesenha a página
+    # As medições de cada atualização vão só para o log (o painel lateral não é refeito pelo trecho)
+    registros = iniciar_medicoes()
+    versao = versao_dados()
+    try:
+        dados = carregar_dados_ao_vivo(versao)
+    except Exception as e:
+        st.error(f"Erro ao carregar dados: {e}")
+        return
     
-    merged['Faixa de Horário Recebido'] = merged['timestamp'].dt.strftime('%H:%M')
-    
-    horarios = merged['Faixa de Horário Recebido'].unique()
-    
-    ruas = merged['name'].dropna().unique()
-    if len(ruas) == 0:
-        ruas = [f"Rua {i} {'Par' if i % 2 == 0 else 'Ímpar'}" for i in range(1, 6)]
-    
-    resultado = []
+    st.caption(f"🟢 Ao vivo: verificado às {datetime.now().strftime('%H:%M:%S')}, "
+               f"a cada {st.session_state.get('intervalo_ao_vivo', INTERVALOS_AO_VIVO[0])} s.")
+    # Relatórios pré-calculados pelo modo batch não acompanham os arquivos: o modo ao vivo não os usa
+    exibir_pagina(pagina, dados, versao, {})
     
-    for horario in sorted(horarios):
-        dados_horario = merged[merged['Faixa de Horário Recebido'] == horario]
-        
-        qtd_conferida = dados_horario['initial_quantity'].sum()
-        
-        nao_rastreado = dados_horario[dados_horario['name'].isna()]['initial_quantity'].sum()
+    if st.session_state.get('gravar_medicoes') and registros:
+        gravar_medicoes(registros, contexto={'pagina': pagina, 'ao_vivo': True})
+
+def exibir_pagina(pagina, dados, versao, precalculados):
+    # Conteúdo da página selecionada; no modo ao vivo é redesenhado sozinho, sem refazer a barra lateral
+    rfid_col_movimento = dados.get('rfid_col_movimento')
+    rfid_col_recebimento = dados.get('rfid_col_recebimento')
+    # No modo ao vivo as tabelas por SKU, de pallets agrupados e de armazenamento saem dos agregados já somados
+    agregados = dados.get('agregados')
+    
+    # Somente os relatórios da página selecionada são calculados (e reaproveitados por versão dos dados)
+    if pagina == "📊 Códigos e Quantidades":
+        with st.spinner("Processando relatórios..."):
+            relatorio1 = precalculados.get('codigos_quantidades')
+            if relatorio1 is None and agregados:
+                relatorio1 = codigos_quantidades(dados['recebimento'], dados.get('saldo_edicoes'), agregados['sku'])
+            if relatorio1 is None:
+                relatorio1 = codigos_quantidades_em_cache(versao, dados['recebimento'], dados.get('saldo_edicoes'))
+            
+            relatorio1b = precalculados.get('total_pallets_por_sku')
+            if relatorio1b is None and agregados and dados.get('saldo_edicoes') is None:
+                relatorio1b = total_pallets_por_sku(dados['recebimento'], somas=agregados['sku'])
+            if relatorio1b is None:
+                relatorio1b = total_pallets_por_sku_em_cache(
+                    versao, dados['recebimento'], dados.get('saldo_edicoes'), rfid_col_recebimento
+                )
+            
+            # Quantidade líquida por pallet só existe com o razão de edições carregado
+            relatorio1c = precalculados.get('quantidades_por_pallet')
+            if relatorio1c is None and dados.get('saldo_edicoes') is not None and rfid_col_recebimento:
+                relatorio1c = quantidades_por_pallet_em_cache(
+                    versao, dados['recebimento'], rfid_col_recebimento, dados['saldo_edicoes']
+                )
         
-        pct_nao_rastreado = '0%'
-        if qtd_conferida > 0:
-            pct_nao_rastreado = f"{int(round((nao_rastreado / qtd_conferida * 100), 0))}%"
+        col1, col2, col3 = st.columns([1, 8, 1])
         
-        linha = {
-            'Faixa de Horário Recebido': horario,
-            'Qtd Pallet Conferido': qtd_conferida,
-            'Não Rastreado': nao_rastreado,
-            '% Não Rastreado': pct_nao_rastreado
-        }
+        with col2:
+            col_left, col_right = st.columns(2)
+            
+            with col_left:
+                st.subheader("CÓDIGOS E QUANTIDADES RECEBIDAS")
+                exibir_tabela(
+                    "códigos e quantidades",
+                    relatorio1,
+                    use_container_width=True,
+                    height=300,
+                    column_config={
+                        "Qtd no Quantum": st.column_config.NumberColumn(
+                            "Qtd no Quantum",
+                            format="%d",
+                            help="Quantidade total de unidades"
+                        )
+                    }
+                )
+            
+            with col_right:
+                st.subheader("ESTATÍSTICAS DE PALLETS POR PRODUTO")
+                
+                exibir_tabela(
+                    "estatísticas por produto",
+                    relatorio1b,
+                    use_container_width=True,
+                    height=300,
+                    column_config={
+                        "Média por Pallet": st.column_config.NumberColumn(
+                            "Média por Pallet",
+                            format="%.2f",
+                            help="Quantidade média de unidades por pallet"
+                        )
+                    }
+                )
         
-        for rua in ruas:
-            qtd_rua = dados_horario[dados_horario['name'] == rua]['initial_quantity'].sum()
-            linha[rua] = qtd_rua
+        if not relatorio1b.empty:
+            st.subheader("VISUALIZAÇÃO DE ESTATÍSTICAS POR PRODUTO")
+            
+            col1, col2, col3 = st.columns([1, 8, 1])
+            
+            with col2:
+                top_n = st.slider("Mostrar principais produtos:", 5, 20, 10)
+                
+                graph_col1, graph_col2 = st.columns(2)
+                
+                with graph_col1:
+                    st.subheader("Produtos com Maior Média de Unidades")
+                    top_produtos = relatorio1b.sort_values('Média por Pallet', ascending=False).head(top_n)
+                    
+                    chart_data = top_produtos[['Código do Item', 'Média por Pallet']].set_index('Código do Item')
+                    st.bar_chart(chart_data, height=300)
+                
+                with graph_col2:
+                    st.subheader("Detecção de Outliers")
+                    relatorio1b['Variação_Max_Min'] = relatorio1b.apply(
+                        lambda row: row['Máximo por Pallet'] / row['Mínimo por Pallet'] 
+                        if row['Mínimo por Pallet'] > 0 else row['Máximo por Pallet'], 
+                        axis=1
+                    )
+                    
+                    outliers = relatorio1b.sort_values('Variação_Max_Min', ascending=False).head(top_n)
+                    
+                    outlier_data = outliers[['Código do Item', 'Variação_Max_Min']].set_index('Código do Item')
+                    st.bar_chart(outlier_data, height=300)
+                    
+                    st.caption("**Interpretação**: Barras mais altas indicam produtos com maior variação entre a quantidade mínima e máxima por pallet, o que pode indicar inconsistências no processo de paletização.")
         
-        resultado.append(linha)
-    
-    resultado_df = pd.DataFrame(resultado)
-    
-    resultado_df = resultado_df.sort_values('Faixa de Horário Recebido')
-    
-    totais = {
-        'Faixa de Horário Recebido': 'TOTAL',
-        'Qtd Pallet Conferido': resultado_df['Qtd Pallet Conferido'].sum(),
-        'Não Rastreado': resultado_df['Não Rastreado'].sum(),
-    }
-    
-    if totais['Qtd Pallet Conferido'] > 0:
-        totais['% Não Rastreado'] = f"{int(round((totais['Não Rastreado'] / totais['Qtd Pallet Conferido'] * 100), 0))}%"
-    else:
-        totais['% Não Rastreado'] = '0%'
-    
-    for rua in ruas:
-        totais[rua] = resultado_df[rua].sum() if rua in resultado_df.columns else 0
-    
-    totais_df = pd.DataFrame([totais])
-    resultado_df = pd.concat([resultado_df, totais_df], ignore_index=True)
+        if relatorio1c is not None and not relatorio1c.empty:
+            st.subheader("QUANTIDADE LÍQUIDA POR PALLET")
+            
+            col1, col2, col3 = st.columns([1, 8, 1])
+            
+            with col2:
+                exibir_tabela(
+                    "quantidade líquida por pallet",
+                    relatorio1c,
+                    use_container_width=True,
+                    height=400
+                )
+                st.caption(f"Quantidade recebida somada às edições (CRATE_PRODUCT_UPDATE) de '{ARQUIVO_EDICAO}'.")
     
-    if has_rfid:
-        rastreados_rfid = len(merged[merged[rfid_col_recebimento].notna()])
-        total_registros = len(merged)
-        pct_rastreados = round((rastreados_rfid / total_registros * 100 if total_registros > 0 else 0), 1)
+    elif pagina == "⏰ Pallets Agrupados":
+        st.subheader("PALLETS AGRUPADOS AO LONGO DO DIA")
         
-        info_df = pd.DataFrame([{
-            'Método de Junção': f"RFID ({rfid_col_recebimento} e {rfid_col_movimento})",
-            'Pallets Rastreados por RFID': rastreados_rfid,
-            'Total de Pallets': total_registros,
-            '% Rastreados por RFID': f"{pct_rastreados}%"
-        }])
+        minutos = st.selectbox(
+            "Agrupar horários a cada (minutos):",
+            INTERVALOS_PALLETS
+        )
+        with st.spinner("Processando relatórios..."):
+            relatorio3 = precalculados.get(f'pallets_agrupados_{minutos}min')
+            if relatorio3 is None and agregados:
+                relatorio3 = tabela_pallets_agrupados(agregados['pallets_agrupados'][minutos])
+            if relatorio3 is None:
+                relatorio3 = pallets_agrupados_em_cache(versao, dados['recebimento'], rfid_col_recebimento, minutos)
         
-        if timestamp_inicio or timestamp_fim:
-            periodo = ""
-            if timestamp_inicio:
-                periodo += f"De: {timestamp_inicio.strftime('%Y-%m-%d %H:%M:%S')}"
-            if timestamp_fim:
-                periodo += f" Até: {timestamp_fim.strftime('%Y-%m-%d %H:%M:%S')}"
-            
-            info_df['Período Filtrado'] = periodo
+        container = st.container()
+        with container:
+            col1, col2, col3 = st.columns([1, 8, 1])
+            with col2:
+                exibir_tabela(
+                    "pallets agrupados",
+                    relatorio3,
+                    use_container_width=True,
+                    height=500
+                )
         
-        return {
-            'resultado': resultado_df,
-            'info_rastreabilidade': info_df
-        }
+        if not relatorio3.empty and 'HH:MM' in relatorio3.columns:
+            st.subheader("ATIVIDADE AO LONGO DO DIA")
+            
+            container = st.container()
+            with container:
+                col1, col2, col3 = st.columns([1, 8, 1])
+                with col2:
+                    dados_grafico = relatorio3[relatorio3['HH:MM'] != 'Total'].copy()
+                    
+                    colunas_numericas = [col for col in dados_grafico.columns if col not in ['HH:MM', 'Local']]
+                    dados_grafico_horario = dados_grafico.groupby('HH:MM')[colunas_numericas].sum().reset_index()
+                    
+                    if not dados_grafico_horario.empty and len(dados_grafico_horario) > 1:
+                        dados_grafico_horario['Total'] = dados_grafico_horario[colunas_numericas].sum(axis=1)
+                        
+                        plot_data = pd.DataFrame({
+                            'Horário': dados_grafico_horario['HH:MM'],
+                            'Total de Pallets': dados_grafico_horario['Total']
+                        })
+                        
+                        exibir_tabela("atividade ao longo do dia", plot_data, use_container_width=True, height=300)
     
-    if timestamp_inicio or timestamp_fim:
-        resultado_info = {
-            'Período Filtrado': "",
-        }
+    elif pagina == "🏬 Armazenado":
+        st.subheader("ARMAZENADO (WAREHOUSE TRACKING)")
         
-        if timestamp_inicio:
-            resultado_info['Período Filtrado'] += f"De: {timestamp_inicio.strftime('%Y-%m-%d %H:%M:%S')}"
-        if timestamp_fim:
-            resultado_info['Período Filtrado'] += f" Até: {timestamp_fim.strftime('%Y-%m-%d %H:%M:%S')}"
+        # Filtro de período: os valores ficam na sessão e cada período calculado fica em cache
+        periodo_inicio, periodo_fim = filtro_periodo(dados['recebimento'])
         
-        info_df = pd.DataFrame([resultado_info])
+        with st.spinner("Processando relatórios..."):
+            if periodo_inicio is not None or periodo_fim is not None:
+                relatorio4_completo = armazenamento_em_cache(versao, dados, periodo_inicio, periodo_fim)
+            elif 'armazenamento_info' in precalculados:
+                relatorio4_completo = {
+                    'resultado': precalculados['armazenamento'],
+                    'info_rastreabilidade': precalculados['armazenamento_info']
+                }
+            elif 'armazenamento' in precalculados:
+                relatorio4_completo = precalculados['armazenamento']
+            elif agregados and agregados['ruas']:
+                relatorio4_completo = tabela_armazenamento(agregados['armazenamento'], agregados['ruas'])
+            else:
+                relatorio4_completo = armazenamento_em_cache(versao, dados)
         
-        return {
-            'resultado': resultado_df,
-            'info_rastreabilidade': info_df
-        }
+        container = st.container()
+        with container:
+            col1, col2, col3 = st.columns([1, 8, 1])
+            with col2:
+                if isinstance(relatorio4_completo, dict) and 'resultado' in relatorio4_completo:
+                    dados_armazenados = relatorio4_completo['resultado'].copy()
+                else:
+                    dados_armazenados = relatorio4_completo.copy()
+                
+                exibir_tabela(
+                    "armazenado",
+                    dados_armazenados,
+                    use_container_width=True,
+                    height=400
+                )
+        
+        if 'Faixa de Horário Recebido' in dados_armazenados.columns and 'Qtd Pallet Conferido' in dados_armazenados.columns:
+            st.subheader("DISTRIBUIÇÃO POR FAIXA DE HORÁRIO")
+            
+            container = st.container()
+            with container:
+                col1, col2, col3 = st.columns([1, 8, 1])
+                with col2:
+                    dados_grafico = dados_armazenados[dados_armazenados['Faixa de Horário Recebido'] != 'TOTAL'].copy()
+                    
+                    if not dados_grafico.empty:
+                        exibir_tabela(
+                            "distribuição por faixa de horário",
+                            dados_grafico[['Faixa de Horário Recebido', 'Qtd Pallet Conferido', 'Não Rastreado', '% Não Rastreado']], 
+                            use_container_width=True,
+                            height=350
+                        )
     
-    return resultado_df
-
-def formatar_titulo(texto):
-    # Formatação de título para Streamlit
-    return texto
+    elif pagina == "🚚 Movimentação":
+        st.subheader("MOVIMENTAÇÃO E PERMANÊNCIA DOS PALLETS")
+        
+        if not rfid_col_movimento:
+            st.warning("Coluna RFID não encontrada nos movimentos: não é possível acompanhar o caminho dos pallets.")
+        else:
+            with st.spinner("Processando relatórios..."):
+                relatorio5 = {
+                    nome[len('movimentacao_'):]: df for nome, df in precalculados.items() if nome.startswith('movimentacao_')
+                }
+                if not relatorio5:
+                    relatorio5 = analise_movimentos_em_cache(versao, dados)
+            
+            pallets = relatorio5['pallets']
+            mediana_stock = pallets['Minutos até STOCK'].median()
+            
+            col1, col2, col3 = st.columns([1, 8, 1])
+            
+            with col2:
+                metrica1, metrica2, metrica3 = st.columns(3)
+                metrica1.metric("Pallets rastreados", f"{len(pallets):,}".replace(',', '.'))
+                metrica2.metric("Movimentos por pallet (média)", f"{pallets['Movimentos'].mean():.1f}" if len(pallets) else "-")
+                metrica3.metric("Recebimento até STOCK (mediana)", f"{mediana_stock:.1f} min" if pd.notna(mediana_stock) else "-")
+                
+                st.subheader("TEMPO DO RECEBIMENTO AO PRIMEIRO STOCK POR RUA")
+                exibir_tabela(
+                    "tempo até stock por rua",
+                    relatorio5['armazenagem_por_rua'],
+                    use_container_width=True,
+                    height=300
+                )
+                st.caption("Ruas ordenadas pela mediana: as primeiras são as de armazenagem mais lenta.")
+                
+                st.subheader("PERMANÊNCIA POR RUA E NÍVEL")
+                exibir_tabela(
+                    "permanência por rua e nível",
+                    relatorio5['permanencia_rua_nivel'],
+                    use_container_width=True,
+                    height=350
+                )
+                st.caption("Permanência: tempo entre um movimento do pallet e o seguinte; a posição atual de cada pallet não entra.")
+                
+                graph_col1, graph_col2 = st.columns(2)
+                
+                with graph_col1:
+                    st.subheader("Movimentos por Pallet")
+                    st.bar_chart(relatorio5['distribuicao_movimentos'].set_index('Movimentos por Pallet'), height=300)
+                
+                with graph_col2:
+                    st.subheader("Pallets Mais Lentos até o STOCK")
+                    # Só o topo da lista: a tabela completa pode ter centenas de milhares de pallets
+                    exibir_tabela(
+                        "pallets mais lentos",
+                        pallets.head(LIMITE_LINHAS_TABELA),
+                        use_container_width=True,
+                        height=300
+                    )
+    
+    elif pagina == "🗺️ Ocupação":
+        st.subheader("OCUPAÇÃO DO ARMAZÉM")
+        
+        grade = grade_ocupacao_em_cache(versao, dados)
+        if grade is None or not grade['contagem'].any():
+            st.warning("Sem posições em STOCK com coordenadas: não é possível montar o mapa de ocupação.")
+        else:
+            col1, col2, col3 = st.columns([1, 8, 1])
+            
+            with col2:
+                faixas = faixas_z_ocupadas(grade)
+                filtro1, filtro2 = st.columns(2)
+                medida = filtro1.radio("Medida:", ["Pallets", "Quantidade"], horizontal=True)
+                faixa = filtro2.selectbox(
+                    "Altura (z):",
+                    [None] + list(faixas),
+                    format_func=lambda faixa: "Todas" if faixa is None else faixas[faixa]
+                )
+                
+                mapa = mapa_ocupacao(grade, faixa)
+                
+                metrica1, metrica2, metrica3 = st.columns(3)
+                metrica1.metric("Pallets em STOCK", f"{int(mapa['Pallets'].sum()):,}".replace(',', '.'))
+                metrica2.metric("Células ocupadas (x, y)", f"{len(mapa):,}".replace(',', '.'))
+                metrica3.metric("Máximo por célula", f"{mapa[medida].max():,.0f}".replace(',', '.') if len(mapa) else "-")
+                
+                mapa_calor = alt.Chart(mapa).mark_rect().encode(
+                    x=alt.X('x:O', title='x'),
+                    y=alt.Y('y:O', title='y', sort='descending'),
+                    color=alt.Color(f'{medida}:Q', scale=alt.Scale(scheme='orangered')),
+                    tooltip=['x', 'y', 'Pallets', 'Quantidade']
+                ).properties(height=500)
+                st.altair_chart(mapa_calor, use_container_width=True)
+                st.caption(f"Cada célula é uma coordenada (x, y); a altura z é agrupada em faixas de {grade['tamanho_z']}.")
+                
+                st.subheader("Células Mais Ocupadas")
+                exibir_tabela(
+                    "células mais ocupadas",
+                    mapa.sort_values(medida, ascending=False).head(LIMITE_LINHAS_TABELA),
+                    use_container_width=True,
+                    height=300
+                )
 
 def main():
     # Função principal da aplicação Streamlit
@@ -292,15 +553,42 @@ def main():
     
     st.title("Plano de Contingência Logística - Análise RFID")
     
-    try:
-        st.cache_data.clear()
-    except:
-        pass
+    # Medições desta execução; o pico de memória depende do tracemalloc, ligado pelo painel de desempenho
+    registros = iniciar_medicoes()
+    ajustar_tracemalloc(st.session_state.get('medir_memoria', False))
+    pagina = None
+    
+    with st.sidebar:
+        if st.button("🔄 Recarregar dados", help="Descarta o cache e lê novamente os arquivos de 'Arquivos/'"):
+            carregar_dados_em_cache.clear()
+            carregar_dados_ao_vivo.clear()
+            limpar_cache_relatorios()
+            reiniciar_ingestao()
+        
+        with st.expander("Modo ao vivo"):
+            ao_vivo = st.checkbox(
+                "Atualizar automaticamente",
+                key='ao_vivo',
+                help="Verifica 'Arquivos/' a cada intervalo e acrescenta só as linhas novas, sem recarregar a página"
+            )
+            st.selectbox("Intervalo (segundos):", INTERVALOS_AO_VIVO, key='intervalo_ao_vivo', disabled=not ao_vivo)
     
     with st.spinner("Carregando dados do diretório 'Arquivos/'..."):
-        dados = carregar_dados()
+        versao = versao_dados()
+        try:
+            dados = carregar_dados_ao_vivo(versao) if ao_vivo else carregar_dados_em_cache(versao)
+        except Exception as e:
+            st.error(f"Erro ao carregar dados: {e}")
+            dados = None
         
         if dados:
+            # Relatórios gerados pelo modo batch (relatorios_batch.py) para esta mesma versão dos dados
+            precalculados = {} if ao_vivo else relatorios_precalculados_em_cache(
+                versao, impressao_digital_arquivos([os.path.join(DIRETORIO_RELATORIOS, 'manifesto.json')])
+            ) or {}
+            if precalculados:
+                st.info(f"Usando relatórios pré-calculados de '{DIRETORIO_RELATORIOS}/'.")
+            
             rfid_col_movimento = dados.get('rfid_col_movimento')
             rfid_col_recebimento = dados.get('rfid_col_recebimento')
             
@@ -309,164 +597,37 @@ def main():
             else:
                 st.warning("Colunas RFID não encontradas. A análise será baseada em coordenadas (x, y, z) e ground_position_alias.")
             
-            with st.spinner("Processando relatórios..."):
-                relatorio1 = codigos_quantidades(dados['recebimento'])
-                relatorio1b = total_pallets_por_sku(dados['recebimento'])
-                relatorio3 = pallets_agrupados(dados['recebimento'], rfid_col_recebimento)
-                
-                relatorio4_completo = armazenamento(
-                    dados['recebimento'], 
-                    dados['movimento'],
-                    rfid_col_recebimento,
-                    rfid_col_movimento
-                )
+            descartadas = {arquivo: linhas for arquivo, linhas in dados.get('linhas_descartadas', {}).items() if linhas}
+            if descartadas:
+                st.warning("Linhas com número inválido de campos foram ignoradas: " +
+                           ", ".join(f"{arquivo}: {linhas}" for arquivo, linhas in descartadas.items()))
             
             with st.sidebar:
                 st.subheader("Navegação")
                 
                 pagina = st.radio(
                     "Selecione a página:",
-                    ["📊 Códigos e Quantidades", "⏰ Pallets Agrupados", "🏬 Armazenado"],
+                    ["📊 Códigos e Quantidades", "⏰ Pallets Agrupados", "🏬 Armazenado", "🚚 Movimentação", "🗺️ Ocupação"],
                     label_visibility="collapsed"
                 )
-            
-            if pagina == "📊 Códigos e Quantidades":
-                col1, col2, col3 = st.columns([1, 8, 1])
                 
-                with col2:
-                    col_left, col_right = st.columns(2)
-                    
-                    with col_left:
-                        st.subheader("CÓDIGOS E QUANTIDADES RECEBIDAS")
-                        st.dataframe(
-                            relatorio1,
-                            use_container_width=True,
-                            height=300,
-                            column_config={
-                                "Qtd no Quantum": st.column_config.NumberColumn(
-                                    "Qtd no Quantum",
-                                    format="%d",
-                                    help="Quantidade total de unidades"
-                                )
+                with st.expander("Memória dos dados carregados"):
+                    st.dataframe(
+                        pd.DataFrame([
+                            {
+                                'Arquivo': arquivo,
+                                'Antes (MB)': round(memoria['antes'] / 1024 ** 2, 2),
+                                'Depois (MB)': round(memoria['depois'] / 1024 ** 2, 2)
                             }
-                        )
-                    
-                    with col_right:
-                        st.subheader("ESTATÍSTICAS DE PALLETS POR PRODUTO")
-                        
-                        st.dataframe(
-                            relatorio1b,
-                            use_container_width=True,
-                            height=300,
-                            column_config={
-                                "Média por Pallet": st.column_config.NumberColumn(
-                                    "Média por Pallet",
-                                    format="%.2f",
-                                    help="Quantidade média de unidades por pallet"
-                                )
-                            }
-                        )
-                
-                if not relatorio1b.empty:
-                    st.subheader("VISUALIZAÇÃO DE ESTATÍSTICAS POR PRODUTO")
-                    
-                    col1, col2, col3 = st.columns([1, 8, 1])
-                    
-                    with col2:
-                        top_n = st.slider("Mostrar principais produtos:", 5, 20, 10)
-                        
-                        graph_col1, graph_col2 = st.columns(2)
-                        
-                        with graph_col1:
-                            st.subheader("Produtos com Maior Média de Unidades")
-                            top_produtos = relatorio1b.sort_values('Média por Pallet', ascending=False).head(top_n)
-                            
-                            chart_data = top_produtos[['Código do Item', 'Média por Pallet']].set_index('Código do Item')
-                            st.bar_chart(chart_data, height=300)
-                        
-                        with graph_col2:
-                            st.subheader("Detecção de Outliers")
-                            relatorio1b['Variação_Max_Min'] = relatorio1b.apply(
-                                lambda row: row['Máximo por Pallet'] / row['Mínimo por Pallet'] 
-                                if row['Mínimo por Pallet'] > 0 else row['Máximo por Pallet'], 
-                                axis=1
-                            )
-                            
-                            outliers = relatorio1b.sort_values('Variação_Max_Min', ascending=False).head(top_n)
-                            
-                            outlier_data = outliers[['Código do Item', 'Variação_Max_Min']].set_index('Código do Item')
-                            st.bar_chart(outlier_data, height=300)
-                            
-                            st.caption("**Interpretação**: Barras mais altas indicam produtos com maior variação entre a quantidade mínima e máxima por pallet, o que pode indicar inconsistências no processo de paletização.")
-                
-            elif pagina == "⏰ Pallets Agrupados":
-                st.subheader("PALLETS AGRUPADOS AO LONGO DO DIA")
-                
-                container = st.container()
-                with container:
-                    col1, col2, col3 = st.columns([1, 8, 1])
-                    with col2:
-                        st.dataframe(
-                            relatorio3,
-                            use_container_width=True,
-                            height=500
-                        )
-                
-                if not relatorio3.empty and 'HH:MM' in relatorio3.columns:
-                    st.subheader("ATIVIDADE AO LONGO DO DIA")
-                    
-                    container = st.container()
-                    with container:
-                        col1, col2, col3 = st.columns([1, 8, 1])
-                        with col2:
-                            dados_grafico = relatorio3[relatorio3['HH:MM'] != 'Total'].copy()
-                            
-                            colunas_numericas = [col for col in dados_grafico.columns if col not in ['HH:MM', 'Local']]
-                            dados_grafico_horario = dados_grafico.groupby('HH:MM')[colunas_numericas].sum().reset_index()
-                            
-                            if not dados_grafico_horario.empty and len(dados_grafico_horario) > 1:
-                                dados_grafico_horario['Total'] = dados_grafico_horario[colunas_numericas].sum(axis=1)
-                                
-                                plot_data = pd.DataFrame({
-                                    'Horário': dados_grafico_horario['HH:MM'],
-                                    'Total de Pallets': dados_grafico_horario['Total']
-                                })
-                                
-                                st.dataframe(plot_data, use_container_width=True, height=300)
+                            for arquivo, memoria in dados.get('memoria', {}).items() if memoria
+                        ]),
+                        hide_index=True
+                    )
             
-            elif pagina == "🏬 Armazenado":
-                st.subheader("ARMAZENADO (WAREHOUSE TRACKING)")
-                
-                container = st.container()
-                with container:
-                    col1, col2, col3 = st.columns([1, 8, 1])
-                    with col2:
-                        if isinstance(relatorio4_completo, dict) and 'resultado' in relatorio4_completo:
-                            dados_armazenados = relatorio4_completo['resultado'].copy()
-                        else:
-                            dados_armazenados = relatorio4_completo.copy()
-                        
-                        st.dataframe(
-                            dados_armazenados,
-                            use_container_width=True,
-                            height=400
-                        )
-                
-                if 'Faixa de Horário Recebido' in dados_armazenados.columns and 'Qtd Pallet Conferido' in dados_armazenados.columns:
-                    st.subheader("DISTRIBUIÇÃO POR FAIXA DE HORÁRIO")
-                    
-                    container = st.container()
-                    with container:
-                        col1, col2, col3 = st.columns([1, 8, 1])
-                        with col2:
-                            dados_grafico = dados_armazenados[dados_armazenados['Faixa de Horário Recebido'] != 'TOTAL'].copy()
-                            
-                            if not dados_grafico.empty:
-                                st.dataframe(
-                                    dados_grafico[['Faixa de Horário Recebido', 'Qtd Pallet Conferido', 'Não Rastreado', '% Não Rastreado']], 
-                                    use_container_width=True,
-                                    height=350
-                                )
+            if ao_vivo:
+                st.fragment(exibir_pagina_ao_vivo, run_every=st.session_state['intervalo_ao_vivo'])(pagina)
+            else:
+                exibir_pagina(pagina, dados, versao, precalculados)
         else:
             st.error("Não foi possível carregar os dados. Verifique se os arquivos estão no diretório 'Arquivos/'.")
             
@@ -475,6 +636,10 @@ def main():
                 st.markdown("2. Confirme que os nomes dos arquivos são 'Teste Movement.csv' e 'Teste recebimento.csv'")
                 st.markdown("3. Verifique o formato dos arquivos CSV (separador ';')")
                 st.markdown("4. Tente reiniciar a aplicação")
+    
+    exibir_medicoes(registros)
+    if st.session_state.get('gravar_medicoes') and registros:
+        gravar_medicoes(registros, contexto={'pagina': pagina})
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()